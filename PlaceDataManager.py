@@ -1,72 +1,190 @@
 import json
-import os
-import osmnx as ox
-from geopy.geocoders import Nominatim
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from place_store import PlaceStore, normalize_name
+from place_index import PlaceIndex
+from geocode_cache import GeocodeCache
+from geocoding_service import GeocodingService
+from osm_boundary_cache import OSMBoundaryCache
+from geometry_lod import build_lods
+from tracing import tracer
 
 
 class PlaceDataManager:
-    def __init__(self, db_file="places_db.json"):
+    def __init__(self, db_file="places_db.sqlite", legacy_db_file="places_db.json",
+                 geometry_format="json", precision=None, geocode_cache_file="geocode_cache.sqlite",
+                 osm_cache_file="osm_boundary_cache.sqlite"):
         self.db_file = db_file
-        self.geolocator = Nominatim(user_agent="travel_live_map_app")
+        self.geocode_cache = GeocodeCache(geocode_cache_file)
+        # Nominatim's usage policy allows at most one request per second
+        self.geocoder = GeocodingService(cache=self.geocode_cache, rate=1.0, geometry='geojson')
+        self.osm_cache = OSMBoundaryCache(osm_cache_file)
+        self.store = PlaceStore(db_file, geometry_format=geometry_format, precision=precision)
+        if legacy_db_file:
+            self.store.migrate_from_json(legacy_db_file)
         self.places = self.load_places()
 
     def load_places(self):
-        if os.path.exists(self.db_file):
-            with open(self.db_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return []
+        with tracer.span('load_places') as span:
+            places = PlaceIndex(self.store.load_all())
+            span['places'] = len(places)
+        return places
 
     def save_places(self):
-        with open(self.db_file, "w", encoding="utf-8") as f:
-            json.dump(self.places, f, indent=4)
+        """Rewrite the whole catalogue; add/remove only write the changed place."""
+        self.store.replace_all(self.places)
+
+    def geocode(self, name):
+        """Geocode a place name, using the persistent cache when possible."""
+        with tracer.span('geocode', query=name):
+            return self.geocoder.geocode(name)
 
     def place_exists(self, name):
         """Check if a place with the same name already exists (case-insensitive)."""
-        return any(p['name'].lower() == name.lower() for p in self.places)
+        return name in self.places
 
     def add_place(self, name):
         """Add a new place to the database (if not already added)."""
-        if any(p['name'].lower() == name.lower() for p in self.places):
+        if self.place_exists(name):
             raise Exception(f"'{name}' is already added.")
 
+        with tracer.span('add_place', place=name):
+            return self.store_place(self.resolve_place(name))
+
+    def store_place(self, place):
+        """Add a place returned by resolve_place to the catalogue."""
+        if self.place_exists(place['name']):
+            raise Exception(f"'{place['name']}' is already added.")
+        self.places.add(place)
+        self.store.put(place)
+        return place
+
+    def add_places(self, names, workers=4, progress=None):
+        """Add many places at once.
+
+        Names already in the catalogue (or repeated in `names`) are skipped.
+        The rest are geocoded and resolved concurrently and written to the
+        store in a single transaction. `progress(done, total, name, error)`
+        is called after each place finishes. Returns a report dict with
+        'added', 'skipped' and 'failed' ((name, error) pairs) lists.
+        """
+        report = {'added': [], 'skipped': [], 'failed': []}
+        pending = []
+        seen = set()
+        for name in names:
+            name = name.strip()
+            if not name:
+                continue
+            key = normalize_name(name)
+            if key in seen or name in self.places:
+                report['skipped'].append(name)
+                continue
+            seen.add(key)
+            pending.append(name)
+
+        places = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.resolve_place, name): name for name in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                error = None
+                try:
+                    places.append(future.result())
+                except Exception as e:
+                    error = str(e)
+                    report['failed'].append((name, error))
+                if progress:
+                    progress(done, len(pending), name, error)
+
+        # Keep the input order rather than completion order
+        order = {normalize_name(name): i for i, name in enumerate(pending)}
+        places.sort(key=lambda p: order[normalize_name(p['name'])])
+        self.store.put_many(places)
+        for place in places:
+            self.places.add(place)
+        report['added'] = [p['name'] for p in places]
+        return report
+
+    def resolve_place(self, name, progress=None):
+        """Geocode a place and fetch its boundaries without storing it.
+
+        Safe to call from a worker thread; `progress(message)` is called as
+        each stage starts.
+        """
         try:
-            location = self.geolocator.geocode(name, geometry='geojson')
-            if not location:
-                raise ValueError("Could not find location")
-
-            boundaries = None
-            try:
-                city_name = name.split(',')[0].strip()
-                gdf = ox.geometries_from_place(city_name, tags={'boundary': 'administrative'})
-                gdf = gdf[gdf.geom_type.isin(['Polygon', 'MultiPolygon'])]
-                if not gdf.empty:
-                    boundaries = json.loads(gdf.geometry.iloc[0].to_json())
-            except Exception as e:
-                print(f"OSM boundary fetch failed: {e}")
-                if 'geojson' in location.raw:
-                    boundaries = location.raw['geojson']
-
-            place = {
-                'name': name,
-                'lat': location.latitude,
-                'lon': location.longitude,
-                'boundaries': boundaries
-            }
-            self.places.append(place)
-            self.save_places()
-            return place
+            with tracer.span('resolve_place', place=name):
+                if progress:
+                    progress(f"Locating {name}...")
+                location = self.geocode(name)
+                if not location:
+                    raise ValueError("Could not find location")
+
+                boundaries = None
+                try:
+                    city_name = name.split(',')[0].strip()
+                    if progress:
+                        progress(f"Fetching boundaries for {city_name}...")
+                    with tracer.span('boundary.OSM', place=name):
+                        osm_result = self.osm_cache.lookup(name, city_name, lambda: self.fetch_osm_boundary(city_name))
+                    if osm_result:
+                        boundaries = osm_result['geometry']
+                except Exception as e:
+                    print(f"OSM boundary fetch failed: {e}")
+                    if 'geojson' in location.raw:
+                        boundaries = location.raw['geojson']
+
+                with tracer.span('build_lods'):
+                    # Simplified copies for drawing at low zoom levels
+                    lods = build_lods(boundaries)
+                return {
+                    'name': name,
+                    'lat': location.latitude,
+                    'lon': location.longitude,
+                    'boundaries': boundaries,
+                    'lods': lods
+                }
 
         except Exception as e:
             raise Exception(f"Geocoding error: {str(e)}")
 
 
+    def fetch_osm_boundary(self, city_name):
+        """Query Overpass for a city's administrative boundary (uncached)."""
+        import osmnx as ox
+        # osmnx geocodes the place through its own Nominatim client first, so the
+        # call takes a token from the geocoder's bucket to stay within the rate limit
+        self.geocoder.bucket.acquire()
+        with tracer.span('osm.overpass', query=city_name) as span:
+            gdf = ox.geometries_from_place(city_name, tags={'boundary': 'administrative'})
+            gdf = gdf[gdf.geom_type.isin(['Polygon', 'MultiPolygon'])]
+            span['features'] = len(gdf)
+        if gdf.empty:
+            return None
+        return {'name': city_name, 'geometry': json.loads(gdf.geometry.iloc[0].to_json())}
+
     def remove_place(self, name):
-        place_to_remove = next((p for p in self.places if p['name'].lower() == name.lower()), None)
+        place_to_remove = self.places.remove(name)
         if place_to_remove:
-            self.places.remove(place_to_remove)
-            self.save_places()
+            self.store.delete(place_to_remove['name'])
             return True
         return False
 
     def get_all_places(self):
         return self.places
+
+    def iter_places(self):
+        """Stream every stored place with its boundaries, one at a time, e.g. for export."""
+        return self.store.iter_places()
+
+    def get_place(self, name):
+        """Look up a place by name (case-insensitive), or None."""
+        return self.places.get(name)
+
+    def get_places_by_year(self, year):
+        return self.places.with_year(year)
+
+    def get_places_by_source(self, source):
+        return self.places.with_source(source)
+
+    def catalogue_version(self):
+        """Changes whenever a place is added, updated or removed."""
+        return self.store.catalogue_version()
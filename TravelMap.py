@@ -0,0 +1,464 @@
+import hashlib
+import json
+from geometry_lod import FULL_DETAIL_ZOOM, LOD_LEVELS, build_lods
+from place_store import normalize_name
+from tracing import tracer
+
+# Keeps the rendered page addressable: every outline lives in one shared
+# GeoJSON layer styled from its feature properties, every marker in one
+# (optionally clustered) marker layer, and both are tracked per place by
+# normalised name, so places can be added and removed without a reload.
+# Each place carries simplified variants ("lods", [min_zoom, geometry] pairs)
+# and the outline is swapped for the matching one whenever the zoom changes.
+# Full-resolution boundaries may be left out of the page and fetched through
+# the detail source (a QWebChannel bridge) the first time they are needed.
+# With options.tileUrl no places are embedded at all: the visible tiles are
+# fetched from a TileServer after every move, already at the right detail.
+MAP_SCRIPT = """
+window.travelMap = (function (map, options) {
+    var places = {};
+    var requestDetail = null;
+    var tiles = {};
+    var shapes = L.geoJSON(null, {style: featureStyle, onEachFeature: trackShape}).addTo(map);
+    var markers = (options.cluster ? L.markerClusterGroup() : L.featureGroup()).addTo(map);
+    var lastShape = null;
+
+    function escapeHtml(text) {
+        var div = document.createElement("div");
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    function featureStyle(feature) {
+        var style = L.extend({}, options.style);
+        var value = options.styleBy ? feature.properties[options.styleBy] : null;
+        if (value !== null && value !== undefined) {
+            // Stable colour per value, e.g. one per year or boundary source
+            var hash = 0;
+            String(value).split("").forEach(function (c) {
+                hash = (hash * 31 + c.charCodeAt(0)) | 0;
+            });
+            style.color = style.fillColor = options.palette[Math.abs(hash) %% options.palette.length];
+        }
+        return style;
+    }
+
+    function trackShape(feature, layer) {
+        lastShape = layer;
+    }
+
+    function levelFor(place, zoom) {
+        // Index into place.lods, or -1 for the full-resolution boundary
+        if (zoom >= options.fullDetailZoom || !place.lods.length) {
+            return -1;
+        }
+        var level = 0;
+        for (var i = 0; i < place.lods.length; i++) {
+            if (place.lods[i][0] <= zoom) {
+                level = i;
+            }
+        }
+        return level;
+    }
+
+    function fetchDetail(place) {
+        place.detail = false;
+        requestDetail(place.key, function (boundaries) {
+            if (places[place.key] === place) {
+                place.boundaries = boundaries;
+                draw(place);
+            }
+        });
+    }
+
+    function draw(place) {
+        var level = levelFor(place, map.getZoom());
+        if (level === -1 && !place.boundaries && place.detail && requestDetail) {
+            fetchDetail(place);
+        }
+        if (level === -1 && !place.boundaries) {
+            // Show the finest variant until the full boundary arrives
+            level = place.lods.length - 1;
+        }
+        setShape(place, level, level === -1 ? place.boundaries : (place.lods[level] || [])[1]);
+    }
+
+    function setShape(place, level, geometry) {
+        if (!geometry || (place.shape && place.level === level)) {
+            return;
+        }
+        if (place.shape) {
+            shapes.removeLayer(place.shape);
+        }
+        shapes.addData({
+            type: "Feature",
+            geometry: geometry,
+            properties: {key: place.key, name: place.name, year: place.year, source: place.source}
+        });
+        place.shape = lastShape;
+        place.level = level;
+    }
+
+    function removePlace(key) {
+        var place = places[key];
+        if (place) {
+            if (place.shape) {
+                shapes.removeLayer(place.shape);
+            }
+            if (place.marker) {
+                markers.removeLayer(place.marker);
+            }
+            delete places[key];
+        }
+    }
+
+    function createPlace(place, batch) {
+        if (options.markers) {
+            place.marker = L.marker([place.lat, place.lon])
+                .bindPopup("<b>" + escapeHtml(place.name) + "</b>")
+                .bindTooltip(escapeHtml(place.name));
+            if (batch) {
+                batch.push(place.marker);
+            } else {
+                markers.addLayer(place.marker);
+            }
+        }
+        places[place.key] = place;
+        return place;
+    }
+
+    function addMarkers(batch) {
+        // The cluster group indexes a whole batch at once
+        if (markers.addLayers) {
+            markers.addLayers(batch);
+        } else {
+            batch.forEach(function (marker) {
+                markers.addLayer(marker);
+            });
+        }
+    }
+
+    function addPlace(place) {
+        removePlace(place.key);
+        draw(createPlace(place));
+    }
+
+    function addPlaces(list) {
+        var batch = [];
+        list.forEach(function (place) {
+            removePlace(place.key);
+            draw(createPlace(place, batch));
+        });
+        addMarkers(batch);
+    }
+
+    function showTile(zoom, collection) {
+        var batch = [];
+        collection.features.forEach(function (feature) {
+            var info = feature.properties;
+            var place = places[info.key] || createPlace({
+                key: info.key, name: info.name, lat: info.lat, lon: info.lon, year: info.year, source: info.source
+            }, batch);
+            // Tiles of the current zoom win over late responses for an earlier one
+            if (zoom === Math.round(map.getZoom()) || !place.shape) {
+                setShape(place, info.level, feature.geometry);
+            }
+        });
+        addMarkers(batch);
+    }
+
+    function fetchTile(zoom, x, y) {
+        var id = zoom + "/" + x + "/" + y;
+        if (tiles[id]) {
+            return;
+        }
+        tiles[id] = true;
+        fetch(L.Util.template(options.tileUrl, {z: zoom, x: x, y: y}))
+            .then(function (response) {
+                return response.json();
+            })
+            .then(function (collection) {
+                showTile(zoom, collection);
+            })
+            .catch(function () {
+                delete tiles[id];
+            });
+    }
+
+    function loadTiles() {
+        var zoom = Math.round(map.getZoom());
+        var n = Math.pow(2, zoom);
+        var bounds = map.getBounds();
+        var topLeft = map.project(bounds.getNorthWest(), zoom).divideBy(256).floor();
+        var bottomRight = map.project(bounds.getSouthEast(), zoom).divideBy(256).floor();
+        var columns = Math.min(bottomRight.x - topLeft.x + 1, n);
+        for (var i = 0; i < columns; i++) {
+            // Wrap columns from copies of the world left and right of the date line
+            var x = topLeft.x + i - Math.floor((topLeft.x + i) / n) * n;
+            for (var y = Math.max(topLeft.y, 0); y <= Math.min(bottomRight.y, n - 1); y++) {
+                fetchTile(zoom, x, y);
+            }
+        }
+    }
+
+    function reloadTiles() {
+        tiles = {};
+        loadTiles();
+    }
+
+    function redraw() {
+        Object.keys(places).forEach(function (key) {
+            draw(places[key]);
+        });
+    }
+
+    function setDetailSource(source) {
+        requestDetail = source;
+        redraw();
+    }
+
+    function clear() {
+        Object.keys(places).forEach(removePlace);
+    }
+
+    if (options.tileUrl) {
+        // Tiles seen at another zoom carry that zoom's detail level, so after a
+        // zoom change every visible tile is fetched again (zoomend precedes moveend)
+        map.on("zoomend", function () {
+            tiles = {};
+        });
+        map.on("moveend", loadTiles);
+        loadTiles();
+    } else {
+        map.on("zoomend", redraw);
+    }
+
+    return {map: map, places: places, addPlace: addPlace, addPlaces: addPlaces, removePlace: removePlace,
+            clear: clear, setDetailSource: setDetailSource, reloadTiles: reloadTiles};
+})(%(map)s, %(options)s);
+"""
+
+# Connects the page to the MapBridge registered on the QWebEnginePage's channel
+BRIDGE_SCRIPT = """
+new QWebChannel(qt.webChannelTransport, function (channel) {
+    travelMap.setDetailSource(function (key, callback) {
+        channel.objects.mapBridge.placeBoundaries(key, function (data) {
+            callback(JSON.parse(data));
+        });
+    });
+});
+"""
+
+
+# Bump when the Python side of the page changes (assets, script injection);
+# edits to the scripts above change PAGE_VERSION on their own. Cached pages
+# from older code then miss instead of being reused.
+RENDER_VERSION = 2
+# Stands in for the tile server URL, whose port changes every run, in cacheable pages
+TILE_URL_PLACEHOLDER = "__travel_map_tile_url__"
+PAGE_VERSION = f"{RENDER_VERSION}-{hashlib.sha1((MAP_SCRIPT + BRIDGE_SCRIPT).encode('utf-8')).hexdigest()[:12]}"
+
+
+class TravelMap:
+    """Manages the folium map and its features
+
+    The page from to_html() exposes a small `travelMap` JavaScript API, so
+    once it is loaded a single place can be added or removed by running the
+    script from add_place_script() / remove_place_script() in the page,
+    instead of regenerating and reloading the whole map.
+
+    With `lod` each boundary is drawn from a simplified variant matching the
+    current zoom. With `lazy_detail` the full-resolution boundaries are left
+    out of the page and served on demand by a MapBridge over QWebChannel.
+
+    Given a running TileServer the page embeds no places at all and loads
+    the visible tiles from it instead, for catalogues too large to inline.
+    The map keeps the server's index in step with add/remove_place.
+
+    All outlines share one GeoJSON layer. `style_by` ("year" or "source")
+    colours each outline by that property of its place, and `cluster` groups
+    the markers with Leaflet.markercluster.
+    """
+
+    STYLE_PROPERTIES = (None, 'year', 'source')
+    PALETTE = ['#3388ff', '#e6194b', '#3cb44b', '#f58231', '#911eb4', '#46f0f0', '#f032e6', '#9a6324']
+
+    def __init__(self, dark_mode=False, markers=True, lod=True, lazy_detail=False, tile_server=None,
+                 style_by=None, cluster=False):
+        if style_by not in self.STYLE_PROPERTIES:
+            raise ValueError(f"Unknown style property: {style_by}")
+        self.dark_mode = dark_mode
+        self.markers = markers
+        self.lod = lod
+        self.lazy_detail = lazy_detail
+        self.tile_server = tile_server
+        self.style_by = style_by
+        self.cluster = cluster
+        self.places = {}
+        # Created by to_html(); folium is only imported when a page is rendered
+        self.map = None
+
+    def _create_map(self):
+        """Create a new map with appropriate styling based on mode"""
+        import folium
+        if self.dark_mode:
+            return folium.Map(
+                location=[20, 0],
+                zoom_start=2,
+                tiles="cartodbdark_matter",
+                control_scale=True
+            )
+        else:
+            return folium.Map(
+                location=[20, 0],
+                zoom_start=2,
+                control_scale=True
+            )
+
+    def _cluster_assets(self):
+        """<script>/<link> tags for Leaflet.markercluster"""
+        from folium.plugins import MarkerCluster
+        tags = [f'<script src="{url}"></script>' for _, url in MarkerCluster.default_js]
+        tags += [f'<link rel="stylesheet" href="{url}"/>' for _, url in MarkerCluster.default_css]
+        return "\n".join(tags) + "\n"
+
+    def style(self):
+        """Leaflet path style for place boundaries"""
+        if self.dark_mode:
+            return {'fillColor': '#19647E', 'color': '#46CDCF', 'weight': 2, 'fillOpacity': 0.4}
+        return {'fillColor': '#3388ff', 'color': '#0055cc', 'weight': 2, 'fillOpacity': 0.4}
+
+    def reset(self):
+        """Reset the map to initial state"""
+        self.places = {}
+        self.map = None
+        if self.tile_server:
+            self.tile_server.index.clear()
+
+    def add_place(self, place):
+        """Add a place to the map"""
+        self.places[normalize_name(place['name'])] = place
+        if self.tile_server:
+            self.tile_server.index.add(place)
+
+    def remove_place(self, name):
+        """Remove a place from the map, returning whether it was shown"""
+        if self.tile_server:
+            self.tile_server.index.remove(name)
+        return self.places.pop(normalize_name(name), None) is not None
+
+    def add_all_places(self, places):
+        """Add all places to the map"""
+        with tracer.span('map.add_all_places') as span:
+            self.reset()
+            for place in places:
+                self.add_place(place)
+            span['places'] = len(self.places)
+
+    def add_place_script(self, place):
+        """JavaScript that adds one place to an already loaded map page"""
+        if self.tile_server:
+            return "travelMap.reloadTiles();"
+        return f"travelMap.addPlace({self._script_json(self._place_data(place))});"
+
+    def remove_place_script(self, name):
+        """JavaScript that removes one place from an already loaded map page"""
+        return f"travelMap.removePlace({json.dumps(normalize_name(name))});"
+
+    def render_key(self):
+        """The settings that affect cacheable_html() output, for use in a render cache key"""
+        return (
+            PAGE_VERSION, self.dark_mode, self.markers, self.lod, LOD_LEVELS, FULL_DETAIL_ZOOM, self.lazy_detail,
+            self.tile_server is not None, self.style_by, self.cluster
+        )
+
+    def place_lods(self, place):
+        """Simplified variants of a place's boundary, computed if the place predates them
+
+        Stored places (LazyPlace) get missing variants built and saved by the
+        store, so this only simplifies unsaved places.
+        """
+        if not self.lod:
+            return []
+        lods = place.get('lods')
+        if lods is None:
+            lods = build_lods(place.get('boundaries'))
+        return lods
+
+    def boundaries_json(self, key):
+        """Full-resolution boundary of a shown place as JSON, for the map bridge"""
+        place = self.places.get(key)
+        return json.dumps(place.get('boundaries') if place else None)
+
+    def _script_json(self, data):
+        # Safe to embed inside a <script> element
+        return json.dumps(data).replace("</", "<\\/")
+
+    def _place_data(self, place):
+        data = {
+            'key': normalize_name(place['name']),
+            'name': place['name'],
+            'lat': place['lat'],
+            'lon': place['lon'],
+            'year': place.get('year'),
+            'source': place.get('boundary_source'),
+            'lods': self.place_lods(place)
+        }
+        if self.lazy_detail and data['lods']:
+            data['boundaries'] = None
+            data['detail'] = True
+        else:
+            data['boundaries'] = place.get('boundaries')
+        return data
+
+    def to_html(self):
+        """Convert map to HTML for display"""
+        return self.finish_page(self.cacheable_html())
+
+    def cacheable_html(self):
+        """The page without details that change every run, for a render cache; see finish_page()"""
+        with tracer.span('map.to_html', places=len(self.places)) as span:
+            html = self._render()
+            span['bytes'] = len(html)
+        return html
+
+    def finish_page(self, html):
+        """Fill the running tile server's URL into a page from cacheable_html()"""
+        if not self.tile_server:
+            return html
+        return html.replace(TILE_URL_PLACEHOLDER, json.dumps(self.tile_server.url)[1:-1], 1)
+
+    def _render(self):
+        if self.map is None:
+            self.map = self._create_map()
+        with tracer.span('map.folium_render'):
+            html = self.map.get_root().render()
+        if self.cluster and self.markers:
+            # The plugin needs L, so it goes after folium's Leaflet links at the end of <head>
+            html = html.replace("</head>", self._cluster_assets() + "</head>", 1)
+        script = MAP_SCRIPT % {
+            'map': self.map.get_name(),
+            'options': json.dumps({
+                'style': self.style(),
+                'markers': self.markers,
+                'fullDetailZoom': FULL_DETAIL_ZOOM,
+                'tileUrl': TILE_URL_PLACEHOLDER if self.tile_server else None,
+                'styleBy': self.style_by,
+                'palette': self.PALETTE,
+                'cluster': self.cluster
+            })
+        }
+        if not self.tile_server and self.places:
+            # One FeatureCollection-style batch rather than a call per place
+            with tracer.span('map.place_data'):
+                places = [self._place_data(place) for place in self.places.values()]
+                script += f"travelMap.addPlaces({self._script_json(places)});"
+        scripts = f"<script>{script}</script>\n"
+        if self.lazy_detail and not self.tile_server:
+            scripts += '<script src="qrc:///qtwebchannel/qwebchannel.js"></script>\n'
+            scripts += f"<script>{BRIDGE_SCRIPT}</script>\n"
+        # folium's own scripts, which create the map, come last in the page
+        head, tail, rest = html.rpartition("</html>")
+        if not tail:
+            return f"{html}\n{scripts}"
+        return f"{head}{scripts}{tail}{rest}"
@@ -0,0 +1,58 @@
+import argparse
+import csv
+import sys
+from PlaceDataManager import PlaceDataManager
+
+
+def read_place_names(path, column=None):
+    """Read place names from a CSV file (by column name) or a plain text list."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if column is None and not path.lower().endswith(".csv"):
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        reader = csv.reader(f)
+        rows = list(reader)
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = (column or "name").lower()
+    if column in header:
+        index = header.index(column)
+        rows = rows[1:]
+    else:
+        # No header row: use the whole line, e.g. "Paris, France"
+        return [", ".join(cell.strip() for cell in row if cell.strip()) for row in rows if any(row)]
+    return [row[index].strip() for row in rows if len(row) > index and row[index].strip()]
+
+
+def print_progress(done, total, name, error):
+    status = f"FAILED: {error}" if error else "ok"
+    print(f"[{done}/{total}] {name}: {status}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import many places into the travel catalogue at once.")
+    parser.add_argument("file", help="CSV file with a 'name' column, or a text file with one place per line")
+    parser.add_argument("--column", help="CSV column holding the place name (default: name)")
+    parser.add_argument("--db", default="places_db.sqlite", help="Place database file")
+    parser.add_argument("--workers", type=int, default=4, help="Number of concurrent lookups")
+    parser.add_argument("--failures", help="Write failed places and their errors to this CSV file")
+    args = parser.parse_args(argv)
+
+    names = read_place_names(args.file, args.column)
+    data_manager = PlaceDataManager(db_file=args.db)
+    report = data_manager.add_places(names, workers=args.workers, progress=print_progress)
+
+    print(f"Added {len(report['added'])}, skipped {len(report['skipped'])} existing, "
+          f"failed {len(report['failed'])}")
+    for name, error in report['failed']:
+        print(f"  {name}: {error}")
+    if args.failures and report['failed']:
+        with open(args.failures, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "error"])
+            writer.writerows(report['failed'])
+    return 1 if report['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
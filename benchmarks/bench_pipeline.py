@@ -0,0 +1,347 @@
+"""Offline benchmarks for the add / persist / render pipeline.
+
+Builds synthetic catalogues (10, 1k and 100k places by default) from the
+boundaries in places_db.json, each copy moved to a random spot, and times
+PlaceDataManager.resolve_place/add_place/save_places/load_places and
+TravelMap.to_html against them. Geocoding and OSM boundaries come from stubs
+that answer from the synthetic catalogue, so no network is used.
+
+    python benchmarks/bench_pipeline.py run
+    python benchmarks/bench_pipeline.py run --sizes 10 1000 --samples 20
+    python benchmarks/bench_pipeline.py compare 5c63d76 a0b4b99
+
+Results are written to benchmarks/results/<commit>.json. The first run of
+every stage is a warm-up traced with tracemalloc for peak memory; the
+timings come from the remaining runs. The 100k catalogue needs a few GB of
+free disk space.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Shared modules live in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from PlaceDataManager import PlaceDataManager
+from TravelMap import TravelMap
+from geocode_cache import CachedLocation
+from geocoding_service import GeocodingService
+from geometry_lod import build_lods
+from place_store import PlaceStore
+from tile_server import TILE_MODE_THRESHOLD, PlaceTileIndex, TileServer
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SOURCES = ('OSM', 'geoBoundaries', 'geopy', 'Local dataset')
+
+
+def translate(geometry, dx, dy):
+    """Return a copy of a GeoJSON geometry moved by (dx, dy) degrees."""
+    if geometry is None:
+        return None
+    if geometry['type'] == 'GeometryCollection':
+        return {'type': 'GeometryCollection', 'geometries': [translate(g, dx, dy) for g in geometry['geometries']]}
+
+    def move(item):
+        if item and isinstance(item[0], (int, float)):
+            return [item[0] + dx, item[1] + dy]
+        return [move(member) for member in item]
+
+    return {'type': geometry['type'], 'coordinates': move(geometry['coordinates'])}
+
+
+class SyntheticWorld:
+    """A deterministic catalogue of `name N` places copied from seed places
+
+    Place i is seed place i % len(seeds) moved to a random position; the
+    same seed and index always give the same place. Names look like
+    "delhi 42", so the stubs can find a place from the query alone.
+    """
+
+    def __init__(self, seed_file, seed=0):
+        with open(seed_file, "r", encoding="utf-8") as f:
+            seeds = json.load(f)
+        self.seed = seed
+        self.seeds = []
+        for place in seeds:
+            boundaries = place.get('boundaries')
+            # Simplify each seed once; moving a boundary does not change its variants
+            self.seeds.append((place, build_lods(boundaries)))
+
+    def place(self, i, with_lods=True):
+        seed_place, seed_lods = self.seeds[i % len(self.seeds)]
+        rng = random.Random(f"{self.seed}:{i}")
+        lat, lon = rng.uniform(-55, 65), rng.uniform(-170, 170)
+        dx, dy = lon - seed_place['lon'], lat - seed_place['lat']
+        place = {
+            'name': f"{seed_place['name']} {i}",
+            'lat': lat,
+            'lon': lon,
+            'year': rng.randint(2000, 2025),
+            'boundary_source': rng.choice(SOURCES),
+            'boundaries': translate(seed_place.get('boundaries'), dx, dy),
+        }
+        if with_lods:
+            place['lods'] = [[min_zoom, translate(geometry, dx, dy)] for min_zoom, geometry in seed_lods]
+        return place
+
+    def index_of(self, name):
+        return int(name.split(',')[0].rsplit(" ", 1)[1])
+
+
+class StubGeolocator:
+    """Stands in for Nominatim, answering from a SyntheticWorld after `latency` seconds"""
+
+    def __init__(self, world, latency=0.0):
+        self.world = world
+        self.latency = latency
+
+    def geocode(self, query, **options):
+        if self.latency:
+            time.sleep(self.latency)
+        place = self.world.place(self.world.index_of(query), with_lods=False)
+        return CachedLocation(place['lat'], place['lon'], place['name'], place['boundaries'])
+
+
+class StubDataManager(PlaceDataManager):
+    """PlaceDataManager with the geocoder and Overpass replaced by SyntheticWorld stubs"""
+
+    def __init__(self, world, directory, latency=0.0):
+        super().__init__(
+            db_file=os.path.join(directory, "places.sqlite"),
+            legacy_db_file=None,
+            geocode_cache_file=os.path.join(directory, "geocode_cache.sqlite"),
+            osm_cache_file=os.path.join(directory, "osm_boundary_cache.sqlite")
+        )
+        self.world = world
+        self.latency = latency
+        self.geocoder.shutdown()
+        self.geocoder = GeocodingService(StubGeolocator(world, latency), cache=self.geocode_cache,
+                                         rate=1e6, burst=1000, geometry='geojson')
+
+    def fetch_osm_boundary(self, city_name):
+        if self.latency:
+            time.sleep(self.latency)
+        place = self.world.place(self.world.index_of(city_name), with_lods=False)
+        return {'name': city_name, 'geometry': place['boundaries']}
+
+    def close(self):
+        self.geocoder.shutdown()
+        self.store.close()
+        self.geocode_cache.close()
+        self.osm_cache.close()
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def measure(run, runs, items=1):
+    """Call run(i) for i in range(runs + 1) and summarise it.
+
+    Call 0 is a warm-up traced for peak memory. run() may return an output
+    size in bytes, which is reported from the last call.
+    """
+    tracemalloc.start()
+    output_bytes = run(0)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    times = []
+    for i in range(1, runs + 1):
+        started = time.perf_counter()
+        output_bytes = run(i)
+        times.append(time.perf_counter() - started)
+    return {
+        'runs': runs,
+        'mean_ms': sum(times) / len(times) * 1000,
+        'p50_ms': percentile(times, 50) * 1000,
+        'p90_ms': percentile(times, 90) * 1000,
+        'p99_ms': percentile(times, 99) * 1000,
+        'max_ms': max(times) * 1000,
+        'throughput': items * len(times) / sum(times) if sum(times) else None,
+        'peak_bytes': peak,
+        'output_bytes': output_bytes,
+    }
+
+
+def file_size(path):
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def seed_catalogue(world, db_file, size, chunk=1000):
+    """Write places 0..size-1 of the world straight to a store."""
+    store = PlaceStore(db_file)
+    for start in range(0, size, chunk):
+        store.put_many([world.place(i) for i in range(start, min(size, start + chunk))])
+    store.close()
+
+
+def bench_size(world, size, samples, repeats, latency):
+    """Run every stage against a catalogue of `size` places, returning {stage: stats}."""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as directory:
+        started = time.perf_counter()
+        seed_catalogue(world, os.path.join(directory, "places.sqlite"), size)
+        print(f"  seeded {size} places in {time.perf_counter() - started:.1f}s")
+        manager = StubDataManager(world, directory, latency)
+        try:
+            # New names start after the catalogue; each sampled call gets its own place
+            names = [world.place(size + i, with_lods=False)['name'] for i in range(2 * (samples + 1))]
+            resolve_names, add_names = names[:samples + 1], names[samples + 1:]
+
+            def resolve(i):
+                manager.resolve_place(resolve_names[i])
+
+            def add(i):
+                manager.add_place(add_names[i])
+                return file_size(manager.db_file)
+
+            def save(i):
+                manager.save_places()
+                return file_size(manager.db_file)
+
+            def load(i):
+                manager.load_places()
+
+            # The second pass finds every place in the geocode and boundary caches
+            results['resolve_place'] = measure(resolve, samples)
+            results['resolve_place_cached'] = measure(resolve, samples)
+            results['add_place'] = measure(add, samples)
+            results['save_places'] = measure(save, repeats, items=len(manager.places))
+            results['load_places'] = measure(load, repeats, items=len(manager.places))
+            manager.places = manager.load_places()
+
+            # Render the way main.py does, switching to tiles for large catalogues
+            tile_server = None
+            if len(manager.places) > TILE_MODE_THRESHOLD:
+                tile_server = TileServer(PlaceTileIndex())
+            travel_map = TravelMap(lazy_detail=True, tile_server=tile_server, cluster=True)
+
+            def render(i):
+                travel_map.add_all_places(manager.places)
+                return len(travel_map.to_html().encode("utf-8"))
+
+            results['to_html'] = measure(render, repeats, items=len(manager.places))
+
+            if tile_server:
+                def tiles(i):
+                    tile_server.index.cache.clear()
+                    return sum(len(tile_server.index.tile_bytes(2, x, y)) for x in range(4) for y in range(4))
+
+                results['world_tiles_z2'] = measure(tiles, repeats, items=16)
+                tile_server.server.server_close()
+        finally:
+            manager.close()
+    return results
+
+
+def git_commit():
+    """Return (short commit id, whether the tree has uncommitted changes)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, bool(status.strip())
+
+
+def print_results(results):
+    for size, stages in results.items():
+        print(f"\n{size} places")
+        print(f"  {'stage':<22}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'per s':>10}{'peak MB':>10}{'output':>12}")
+        for stage, stats in stages.items():
+            throughput = f"{stats['throughput']:.1f}" if stats['throughput'] else "-"
+            output = stats['output_bytes'] if stats['output_bytes'] is not None else "-"
+            print(f"  {stage:<22}{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+                  f"{throughput:>10}{stats['peak_bytes'] / 2 ** 20:>10.1f}{output:>12}")
+
+
+def run(args):
+    world = SyntheticWorld(args.seed_file, args.seed)
+    commit, dirty = git_commit()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {'sizes': args.sizes, 'samples': args.samples, 'repeats': args.repeats,
+                    'latency': args.latency, 'seed': args.seed},
+        'results': {},
+    }
+    for size in args.sizes:
+        print(f"Benchmarking {size} places...")
+        report['results'][str(size)] = bench_size(world, size, args.samples, args.repeats, args.latency)
+    print_results(report['results'])
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+    return 0
+
+
+def load_report(name):
+    """Load a results file by path or by the commit it was recorded at."""
+    path = name if os.path.exists(name) else os.path.join(RESULTS_DIR, f"{name}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(args):
+    base, new = load_report(args.base), load_report(args.new)
+    print(f"{base['commit']} -> {new['commit']}{' (dirty)' if new.get('dirty') else ''}")
+    for size, stages in new['results'].items():
+        base_stages = base['results'].get(size, {})
+        print(f"\n{size} places")
+        print(f"  {'stage':<22}{'base p50':>10}{'new p50':>10}{'change':>9}{'base MB':>9}{'new MB':>9}")
+        for stage, stats in stages.items():
+            old = base_stages.get(stage)
+            if old is None:
+                print(f"  {stage:<22}{'-':>10}{stats['p50_ms']:>10.2f}")
+                continue
+            change = (stats['p50_ms'] / old['p50_ms'] - 1) * 100 if old['p50_ms'] else 0
+            print(f"  {stage:<22}{old['p50_ms']:>10.2f}{stats['p50_ms']:>10.2f}{change:>+8.0f}%"
+                  f"{old['peak_bytes'] / 2 ** 20:>9.1f}{stats['peak_bytes'] / 2 ** 20:>9.1f}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the add/render/persist pipeline offline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Run the benchmarks and record the results")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000],
+                            help="Catalogue sizes to benchmark")
+    run_parser.add_argument("--samples", type=int, default=50, help="Places resolved/added per size")
+    run_parser.add_argument("--repeats", type=int, default=5, help="Runs of the whole-catalogue stages")
+    run_parser.add_argument("--latency", type=float, default=0.0,
+                            help="Simulated geocoder and Overpass latency in seconds")
+    run_parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic catalogues")
+    run_parser.add_argument("--seed-file", default=os.path.join(ROOT, "places_db.json"),
+                            help="Places whose boundaries the catalogues are built from")
+    run_parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>.json)")
+    compare_parser = commands.add_parser("compare", help="Compare two recorded results")
+    compare_parser.add_argument("base", help="Results file or commit id")
+    compare_parser.add_argument("new", help="Results file or commit id")
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return run(args)
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
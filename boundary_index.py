@@ -0,0 +1,86 @@
+from name_index import NameIndex
+
+
+class BoundaryIndex:
+    """STRtree-backed point-in-polygon lookups over one boundary layer
+
+    The tree is built once when the index is created. A lookup queries the
+    tree with the point's bounding box and refines the candidates with an
+    exact containment test, instead of calling contains() on every row.
+
+    When the layer has a name column a NameIndex over it is built as well
+    (unless index_names is False), for fuzzy matching and autocompletion.
+    """
+
+    def __init__(self, gdf, name_col=None, index_names=True):
+        self.gdf = gdf
+        self.name_col = name_col
+        self.sindex = gdf.sindex  # geopandas builds the STRtree on first access
+        self.names = None
+        if index_names and name_col is not None and name_col in gdf.columns:
+            self.names = NameIndex(gdf[name_col].tolist())
+        self._join_frame = None
+
+    def __len__(self):
+        return len(self.gdf)
+
+    def locate(self, point):
+        """Return the position of the first feature containing point, or None."""
+        positions = self.sindex.query(point, predicate='within')
+        if len(positions) == 0:
+            return None
+        # Match the row order a linear scan would have used
+        return int(positions.min())
+
+    def locate_row(self, point):
+        """Return the first feature (row) containing point, or None."""
+        position = self.locate(point)
+        return None if position is None else self.gdf.iloc[position]
+
+    def locate_many(self, points):
+        """Return, for each point, the position of the first feature containing it (or None)."""
+        import numpy as np
+        point_positions, feature_positions = self.sindex.query(np.asarray(points), predicate='within')
+        result = [None] * len(points)
+        for point_position, feature_position in zip(point_positions.tolist(), feature_positions.tolist()):
+            current = result[point_position]
+            if current is None or feature_position < current:
+                result[point_position] = feature_position
+        return result
+
+    def locate_lat_lons(self, lat_lons):
+        """Vectorised lookup of many (lat, lon) pairs with a spatial join.
+
+        Returns, for each pair, the position of the first feature containing
+        it (or None).
+        """
+        if not lat_lons:
+            return []
+        import geopandas as gpd
+        if self._join_frame is None:
+            # Positional index so index_right holds row positions
+            self._join_frame = self.gdf[['geometry']].reset_index(drop=True)
+        lats, lons = zip(*lat_lons)
+        points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(lons, lats), crs=self.gdf.crs)
+        joined = gpd.sjoin(points, self._join_frame, how='inner', predicate='within')
+        first = joined.groupby(level=0)['index_right'].min()
+        result = [None] * len(lat_lons)
+        for point_position, feature_position in first.items():
+            result[point_position] = int(feature_position)
+        return result
+
+    def match_name(self, name, score_cutoff=80):
+        """Fuzzy-match a name against the layer: (matched name, score, row position) or None."""
+        if self.names is None:
+            return None
+        return self.names.extract_one(name, score_cutoff=score_cutoff)
+
+    def geometry_at(self, position):
+        """Return the GeoJSON geometry of the feature at position."""
+        return self.gdf.geometry.iloc[position].__geo_interface__
+
+    def name_at(self, position, default=None):
+        """Return the name of the feature at position, if the layer has a name column."""
+        if self.name_col is None or self.name_col not in self.gdf.columns:
+            return default
+        return self.gdf[self.name_col].iloc[position]
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+from collections.abc import Mapping
+from boundary_index import BoundaryIndex
+from tracing import tracer
+
+
+class BoundaryLayers(Mapping):
+    """Lazily loaded, simplified GeoPackage layers keyed by layer name
+
+    Nothing is read at construction. A layer is loaded, simplified and
+    indexed the first time it is looked up, and the simplified result is
+    written to `cache_dir` as GeoParquet under a key made from the source
+    file's path, size and mtime, the layer name and the tolerance. Later runs
+    read that file instead of re-reading and re-simplifying the GeoPackage.
+
+    Iteration follows `layer_priority`, limited to layers present in the file.
+    """
+
+    def __init__(self, path, layer_priority, name_column, columns=None, tolerance=0.001,
+                 cache_dir="layer_cache"):
+        self.path = path
+        self.layer_priority = layer_priority
+        self.name_column = name_column
+        self.columns = columns
+        self.tolerance = tolerance
+        self.cache_dir = cache_dir
+        self.indexes = {}
+        self.failed = set()
+        self._available = None
+        self.lock = threading.Lock()
+        self.layer_locks = {}
+
+    def available(self):
+        """Return the prioritised layer names present in the GeoPackage."""
+        if self._available is None:
+            import geopandas as gpd
+            try:
+                layer_names = gpd.list_layers(self.path)['name'].tolist()
+                print(f"Available layers in GeoPackage: {layer_names}")
+            except Exception as e:
+                print(f"Error accessing GeoPackage: {e}")
+                layer_names = []
+            self._available = [name for name in self.layer_priority if name in layer_names]
+        return self._available
+
+    def __iter__(self):
+        return (name for name in self.available() if name not in self.failed)
+
+    def __len__(self):
+        return len([name for name in self.available() if name not in self.failed])
+
+    def __contains__(self, layer_name):
+        return layer_name in self.available() and layer_name not in self.failed
+
+    def __getitem__(self, layer_name):
+        index = self.indexes.get(layer_name)
+        if index is not None:
+            return index
+        if layer_name not in self:
+            raise KeyError(layer_name)
+        with self.lock:
+            layer_lock = self.layer_locks.setdefault(layer_name, threading.Lock())
+        with layer_lock:
+            if layer_name not in self.indexes:
+                try:
+                    with tracer.span('boundary_layers.load', layer=layer_name):
+                        gdf = self._load(layer_name)
+                except Exception as e:
+                    print(f"Error loading layer '{layer_name}': {e}")
+                    self.failed.add(layer_name)
+                    raise KeyError(layer_name)
+                self.indexes[layer_name] = BoundaryIndex(gdf, self.name_column(layer_name))
+                print(f"Loaded layer '{layer_name}' with {len(gdf)} features")
+        return self.indexes[layer_name]
+
+    def loaded(self):
+        """Return the layers that have already been loaded, without loading more."""
+        return {name: self.indexes[name] for name in self.layer_priority if name in self.indexes}
+
+    def preload(self):
+        """Load every available layer, e.g. from a background thread after startup."""
+        for layer_name in list(self):
+            try:
+                self[layer_name]
+            except KeyError:
+                pass
+
+    def cache_path(self, layer_name):
+        stat = os.stat(self.path)
+        key = "|".join(str(part) for part in (
+            os.path.abspath(self.path), stat.st_size, stat.st_mtime_ns, layer_name, self.tolerance, self.columns
+        ))
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{layer_name}-{digest}.parquet")
+
+    def _load(self, layer_name):
+        import geopandas as gpd
+        cache_path = self.cache_path(layer_name)
+        if os.path.exists(cache_path):
+            try:
+                gdf = gpd.read_parquet(cache_path)
+                tracer.count('layer_cache.hit')
+                return gdf
+            except Exception as e:
+                print(f"Ignoring unreadable layer cache {cache_path}: {e}")
+
+        tracer.count('layer_cache.miss')
+        with tracer.span('geopackage.read', layer=layer_name) as span:
+            gdf = gpd.read_file(self.path, layer=layer_name, columns=self.columns)
+            span['features'] = len(gdf)
+        # Simplify geometries to reduce memory usage
+        gdf['geometry'] = gdf['geometry'].simplify(tolerance=self.tolerance, preserve_topology=True)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            gdf.to_parquet(cache_path)
+            self._remove_stale(layer_name, cache_path)
+        except ImportError:
+            print("pyarrow is not installed, simplified layers will not be cached")
+        except Exception as e:
+            print(f"Could not cache layer '{layer_name}': {e}")
+        return gdf
+
+    def _remove_stale(self, layer_name, current_path):
+        """Delete cache files left from older versions of the layer."""
+        for file_name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, file_name)
+            if file_name.startswith(f"{layer_name}-") and path != current_path:
+                os.remove(path)
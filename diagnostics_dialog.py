@@ -0,0 +1,51 @@
+from PyQt5.QtGui import QFontDatabase
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QPushButton, QFileDialog, QMessageBox
+)
+
+
+class DiagnosticsDialog(QDialog):
+    """Shows the tracer's span timings and counters, and exports the trace
+
+    Exports as a Chrome trace (.json, for chrome://tracing or Perfetto) or
+    as JSON lines (.jsonl).
+    """
+
+    def __init__(self, tracer, parent=None):
+        super().__init__(parent)
+        self.tracer = tracer
+        self.setWindowTitle("Diagnostics")
+        self.resize(700, 450)
+        layout = QVBoxLayout(self)
+
+        self.summary = QPlainTextEdit()
+        self.summary.setReadOnly(True)
+        self.summary.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        layout.addWidget(self.summary)
+
+        buttons = QHBoxLayout()
+        for label, slot in (("Refresh", self.refresh), ("Export Trace...", self.export),
+                            ("Clear", self.clear), ("Close", self.accept)):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+        self.refresh()
+
+    def refresh(self):
+        self.summary.setPlainText(self.tracer.summary_text())
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Trace", "travel_map_trace.json", "Chrome trace (*.json);;JSON lines (*.jsonl)"
+        )
+        if not path:
+            return
+        try:
+            self.tracer.export(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not write {path}: {e}")
+
+    def clear(self):
+        self.tracer.clear()
+        self.refresh()
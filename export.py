@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import sys
+from place_store import PlaceStore
+from tracing import tracer
+
+# Properties written to the GIS formats, which need a fixed schema
+SCHEMA_PROPERTIES = {
+    'name': 'str',
+    'lat': 'float',
+    'lon': 'float',
+    'year': 'int',
+    'boundary_source': 'str',
+}
+FORMATS = {
+    '.geojsonl': 'geojsonseq',
+    '.geojsons': 'geojsonseq',
+    '.geojsonseq': 'geojsonseq',
+    '.gpkg': 'GPKG',
+    '.fgb': 'FlatGeobuf',
+}
+
+
+def place_feature(place, properties=None):
+    """A GeoJSON Feature for a place; its location as a Point if it has no boundary."""
+    geometry = place.get('boundaries') or {'type': 'Point', 'coordinates': [place['lon'], place['lat']]}
+    if properties is None:
+        values = {k: v for k, v in place.items() if k not in ('boundaries', 'lods', 'bbox')}
+    else:
+        values = {k: place.get(k) for k in properties}
+    feature = {'type': 'Feature', 'geometry': geometry, 'properties': values}
+    if place.get('bbox'):
+        feature['bbox'] = list(place['bbox'])
+    return feature
+
+
+def export_geojsonseq(places, path, record_separator=None):
+    """Write places as newline-delimited GeoJSON features, returning the count.
+
+    With record_separator (the default for .geojsons files) each feature
+    starts with an ASCII RS character, as in RFC 8142.
+    """
+    if record_separator is None:
+        record_separator = path.lower().endswith(".geojsons")
+    prefix = "\x1e" if record_separator else ""
+    count = 0
+    temp_file = path + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        for place in places:
+            f.write(prefix + json.dumps(place_feature(place)) + "\n")
+            count += 1
+    os.replace(temp_file, path)
+    return count
+
+
+def export_fiona(places, path, driver, layer="places", batch_size=1000):
+    """Write places to a GeoPackage or FlatGeobuf file with fiona, returning the count.
+
+    Features are written in batches of `batch_size`, so only one batch is
+    held in memory. Both formats get a spatial index (an R-tree in the
+    GeoPackage, a packed Hilbert R-tree in the FlatGeobuf file) for fast
+    bbox queries.
+    """
+    import fiona
+
+    schema = {'geometry': 'Unknown', 'properties': SCHEMA_PROPERTIES}
+    # Keep the extension; GDAL warns about GeoPackages named otherwise
+    root, extension = os.path.splitext(path)
+    temp_file = f"{root}.tmp{extension}"
+    if os.path.exists(temp_file):
+        os.remove(temp_file)
+    count = 0
+    with fiona.open(temp_file, "w", driver=driver, schema=schema, crs="EPSG:4326", layer=layer,
+                    SPATIAL_INDEX="YES") as dst:
+        batch = []
+        for place in places:
+            batch.append(place_feature(place, SCHEMA_PROPERTIES))
+            if len(batch) >= batch_size:
+                dst.writerecords(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            dst.writerecords(batch)
+            count += len(batch)
+    os.replace(temp_file, path)
+    return count
+
+
+def export_places(places, path, format=None):
+    """Stream places to path, in the format given or implied by its extension."""
+    if format is None:
+        format = FORMATS.get(os.path.splitext(path)[1].lower())
+        if format is None:
+            raise ValueError(f"Cannot tell the export format from {path}; use one of {', '.join(FORMATS)}")
+    with tracer.span('export', format=format) as span:
+        if format == 'geojsonseq':
+            count = export_geojsonseq(places, path)
+        elif format in ('GPKG', 'FlatGeobuf'):
+            count = export_fiona(places, path, format)
+        else:
+            raise ValueError(f"Unknown export format: {format}")
+        span['places'] = count
+        span['bytes'] = os.path.getsize(path)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the travel catalogue for GIS tools.")
+    parser.add_argument("output", help="Output file: .geojsonl/.geojsons (GeoJSON-seq), .gpkg or .fgb")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())),
+                        help="Output format (default: from the file extension)")
+    parser.add_argument("--db", default="places_db.sqlite", help="Place database file")
+    args = parser.parse_args(argv)
+
+    store = PlaceStore(args.db)
+    try:
+        count = export_places(store.iter_places(), args.output, args.format)
+    except (ValueError, ImportError) as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        store.close()
+    print(f"Exported {count} places to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
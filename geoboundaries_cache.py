@@ -0,0 +1,162 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from boundary_index import BoundaryIndex
+from tracing import tracer
+
+
+class GeoBoundariesCache:
+    """Local, content-addressed cache of geoBoundaries country datasets
+
+    Each downloaded dataset is stored once under the SHA-256 of its GeoJSON,
+    converted to GeoParquet with rows in Hilbert order and per-feature bbox
+    columns, so reloading it is a columnar read and the STRtree builds in
+    milliseconds. index.json records the geoBoundaries metadata (boundaryID,
+    buildDate, download URL) used to decide whether a refresh is needed.
+
+    Datasets are re-validated against the API after `max_age` seconds; if the
+    API cannot be reached, or `offline` is set, the cached copy is used.
+    """
+
+    API_URL = "https://www.geoboundaries.org/api/current/gbOpen/{iso3}/{level}/"
+
+    def __init__(self, cache_dir="geoboundaries_cache", max_age=30 * 24 * 3600, offline=False):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.offline = offline
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.loaded = {}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self.entries = self._load_index()
+
+    def _load_index(self):
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                print(f"Error decoding {self.index_file}, starting with an empty cache")
+        return {}
+
+    def _save_index(self):
+        temp_file = self.index_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=4)
+        os.replace(temp_file, self.index_file)
+
+    def get(self, iso3, level="ADM2"):
+        """Return a BoundaryIndex for a country's boundaries, downloading only when needed."""
+        key = f"{iso3.upper()}/{level.upper()}"
+        with self.lock:
+            if key in self.loaded:
+                tracer.count('geoboundaries.memory_hit')
+                return self.loaded[key]
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        # One download per dataset even when several workers ask at once
+        with key_lock:
+            with self.lock:
+                if key in self.loaded:
+                    return self.loaded[key]
+            with tracer.span('geoboundaries.load', dataset=key):
+                index = BoundaryIndex(self._fetch(key, iso3.upper(), level.upper()), 'shapeName')
+            with self.lock:
+                self.loaded[key] = index
+        return index
+
+    def _fetch(self, key, iso3, level):
+        entry = self.entries.get(key)
+        if entry and (self.offline or time.time() - entry['checked_at'] < self.max_age):
+            return self._read_dataset(entry)
+        if self.offline:
+            raise ValueError(f"geoBoundaries {key} is not cached and offline mode is on")
+        import requests
+
+        try:
+            response = requests.get(self.API_URL.format(iso3=iso3, level=level), timeout=10)
+            response.raise_for_status()
+            metadata = response.json()
+        except Exception as e:
+            if entry:
+                print(f"geoBoundaries API unavailable ({e}), using cached {key}")
+                return self._read_dataset(entry)
+            raise
+
+        if entry and all(entry.get(field) == metadata.get(field)
+                         for field in ('boundaryID', 'buildDate', 'gjDownloadURL')):
+            entry['checked_at'] = time.time()
+            with self.lock:
+                self._save_index()
+            return self._read_dataset(entry)
+
+        download_url = metadata.get('gjDownloadURL')
+        if not download_url:
+            raise ValueError(f"geoBoundaries has no download for {key}")
+        print(f"geoBoundaries: downloading {key}")
+        with tracer.span('geoboundaries.download', dataset=key) as span:
+            response = requests.get(download_url, timeout=120)
+            response.raise_for_status()
+            content = response.content
+            span['bytes'] = len(content)
+        content_hash = hashlib.sha256(content).hexdigest()
+        gdf, path = self._store_dataset(content, content_hash)
+
+        with self.lock:
+            self.entries[key] = {
+                'content_hash': content_hash,
+                'path': os.path.basename(path),
+                'boundaryID': metadata.get('boundaryID'),
+                'buildDate': metadata.get('buildDate'),
+                'sourceDataUpdateDate': metadata.get('sourceDataUpdateDate'),
+                'gjDownloadURL': download_url,
+                'fetched_at': time.time(),
+                'checked_at': time.time()
+            }
+            self._save_index()
+        return gdf
+
+    def _store_dataset(self, content, content_hash):
+        """Write a downloaded dataset under its content hash, reusing an existing copy."""
+        parquet_path = os.path.join(self.cache_dir, f"{content_hash}.parquet")
+        geojson_path = os.path.join(self.cache_dir, f"{content_hash}.geojson")
+        for path in (parquet_path, geojson_path):
+            if os.path.exists(path):
+                return self._read_path(path), path
+
+        import geopandas as gpd
+        gdf = gpd.read_file(io.BytesIO(content))
+        gdf = gdf.iloc[gdf.hilbert_distance().argsort()].reset_index(drop=True)
+        bounds = gdf.bounds
+        for column in ('minx', 'miny', 'maxx', 'maxy'):
+            gdf[f'bbox_{column}'] = bounds[column]
+        try:
+            gdf.to_parquet(parquet_path)
+            return gdf, parquet_path
+        except ImportError:
+            # GeoParquet needs pyarrow; keep the raw GeoJSON so we still skip the download
+            with open(geojson_path, "wb") as f:
+                f.write(content)
+            return gdf, geojson_path
+
+    def _read_dataset(self, entry):
+        return self._read_path(os.path.join(self.cache_dir, entry['path']))
+
+    @staticmethod
+    def _read_path(path):
+        import geopandas as gpd
+        if path.endswith(".parquet"):
+            return gpd.read_parquet(path)
+        return gpd.read_file(path)
+
+    def refresh(self, iso3, level="ADM2"):
+        """Force re-validation of a dataset against the geoBoundaries API."""
+        key = f"{iso3.upper()}/{level.upper()}"
+        with self.lock:
+            self.loaded.pop(key, None)
+            if key in self.entries:
+                self.entries[key]['checked_at'] = 0
+        return self.get(iso3, level)
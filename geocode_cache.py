@@ -0,0 +1,133 @@
+import sqlite3
+import threading
+import time
+from geometry_codec import encode_geometry, decode_geometry
+from place_store import normalize_name
+from tracing import tracer
+
+
+class CachedLocation:
+    """The subset of a geopy Location that the app uses"""
+
+    def __init__(self, latitude, longitude, address="", geojson=None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.address = address
+        self.raw = {'geojson': geojson} if geojson is not None else {}
+
+    @classmethod
+    def from_location(cls, location):
+        """Build a cached location from a geopy Location."""
+        return cls(location.latitude, location.longitude, location.address, location.raw.get('geojson'))
+
+    def __repr__(self):
+        return f"CachedLocation({self.address!r}, ({self.latitude}, {self.longitude}))"
+
+
+class GeocodeCache:
+    """Persistent geocoding cache keyed by normalised query
+
+    Each lookup result is written as its own row, so a cache miss costs one
+    small insert. Entries older than `ttl` seconds are treated as misses, and
+    the least recently used entries are evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(self, db_file="geocode_cache.sqlite", max_entries=5000, ttl=30 * 24 * 3600):
+        self.db_file = db_file
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS geocode (
+                    query_key TEXT PRIMARY KEY,
+                    latitude REAL NOT NULL,
+                    longitude REAL NOT NULL,
+                    address TEXT,
+                    geojson BLOB,
+                    stored_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS geocode_last_used ON geocode (last_used)")
+
+    def get(self, query):
+        """Return a CachedLocation for the query, or None on a miss."""
+        key = normalize_name(query)
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT latitude, longitude, address, geojson, stored_at FROM geocode WHERE query_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                tracer.count('geocode_cache.miss')
+                return None
+            latitude, longitude, address, geojson, stored_at = row
+            if self.ttl is not None and now - stored_at > self.ttl:
+                self.conn.execute("DELETE FROM geocode WHERE query_key = ?", (key,))
+                self.misses += 1
+                tracer.count('geocode_cache.miss')
+                return None
+            self.conn.execute("UPDATE geocode SET last_used = ? WHERE query_key = ?", (now, key))
+        self.hits += 1
+        tracer.count('geocode_cache.hit')
+        return CachedLocation(latitude, longitude, address, decode_geometry(geojson) if geojson else None)
+
+    def put(self, query, location):
+        """Store the fields we use from a geopy Location (or CachedLocation)."""
+        cached = location if isinstance(location, CachedLocation) else CachedLocation.from_location(location)
+        geojson = cached.raw.get('geojson')
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (normalize_name(query), cached.latitude, cached.longitude, cached.address,
+                 encode_geometry(geojson) if geojson else None, now, now)
+            )
+            self._evict()
+        return cached
+
+    def _evict(self):
+        if self.ttl is not None:
+            self.conn.execute("DELETE FROM geocode WHERE stored_at < ?", (time.time() - self.ttl,))
+        if self.max_entries is not None:
+            self.conn.execute("""
+                DELETE FROM geocode WHERE query_key IN (
+                    SELECT query_key FROM geocode ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def lookup(self, query, geocode):
+        """Return the cached location for query, calling geocode(query) on a miss.
+
+        Results of None (place not found) are not cached.
+        """
+        cached = self.get(query)
+        if cached is not None:
+            return cached
+        location = geocode(query)
+        if location is None:
+            return None
+        return self.put(query, location)
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM geocode")
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+
+    def stats(self):
+        """Return hit/miss counters and the current size as a dict."""
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self)}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
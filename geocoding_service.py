@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from place_store import normalize_name
+from tracing import tracer
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `capacity` at once"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Drain the bucket so no request is made for `seconds`, e.g. after HTTP 429."""
+        with self.lock:
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+            self.updated = time.monotonic()
+
+
+class GeocodingService:
+    """Rate-limited, concurrent wrapper around a geopy geocoder
+
+    Requests run on a bounded thread pool and share one token bucket, so any
+    number of callers stays within the provider's rate limit (Nominatim allows
+    one request per second). Identical queries that are already in flight are
+    coalesced into one request, results go through the optional GeocodeCache,
+    and transient errors are retried with exponential backoff.
+
+    Pass `domain`/`scheme` to point the default Nominatim geolocator at another
+    server, such as a local stub for testing. geopy is imported, and the
+    default geolocator created, on the first request.
+    """
+
+    def __init__(self, geolocator=None, cache=None, rate=1.0, burst=1, workers=4, retries=3, backoff=1.0,
+                 domain=None, scheme=None, **query_options):
+        self.geolocator = geolocator
+        self.geolocator_options = {'user_agent': "travel_live_map_app"}
+        if domain:
+            self.geolocator_options['domain'] = domain
+        if scheme:
+            self.geolocator_options['scheme'] = scheme
+        self.cache = cache
+        self.bucket = TokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.query_options = query_options
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="geocoder")
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.requests_made = 0
+
+    def submit(self, query):
+        """Start geocoding a query and return a Future for its location (or None)."""
+        key = normalize_name(query)
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            self.in_flight[key] = future
+        self.executor.submit(self._run, key, query, future)
+        return future
+
+    def geocode(self, query):
+        """Geocode a query, blocking until the result is available."""
+        return self.submit(query).result()
+
+    def geocode_many(self, queries):
+        """Geocode several queries concurrently, returning {query: location or exception}."""
+        futures = {query: self.submit(query) for query in queries}
+        results = {}
+        for query, future in futures.items():
+            try:
+                results[query] = future.result()
+            except Exception as e:
+                results[query] = e
+        return results
+
+    def _run(self, key, query, future):
+        try:
+            if self.cache is not None:
+                result = self.cache.lookup(query, self._request)
+            else:
+                result = self._request(query)
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def get_geolocator(self):
+        """Return the geolocator, creating the default Nominatim one on first use."""
+        with self.lock:
+            if self.geolocator is None:
+                from geopy.geocoders import Nominatim
+                self.geolocator = Nominatim(**self.geolocator_options)
+            return self.geolocator
+
+    def _request(self, query):
+        """Make one rate-limited request, retrying transient failures."""
+        from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable
+        geolocator = self.get_geolocator()
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            with self.lock:
+                self.requests_made += 1
+            try:
+                with tracer.span('geocode.request', query=query, attempt=attempt):
+                    return geolocator.geocode(query, **self.query_options)
+            except (GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited) as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+                if isinstance(e, GeocoderRateLimited) and e.retry_after:
+                    delay = max(delay, e.retry_after)
+                    self.bucket.pause(delay)
+                print(f"Geocoding '{query}' failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,179 @@
+import struct
+import sys
+from array import array
+
+MAGIC = b'GC'
+VERSION = 1
+
+GEOMETRY_TYPES = ['Point', 'LineString', 'Polygon', 'MultiPoint', 'MultiLineString', 'MultiPolygon',
+                  'GeometryCollection']
+TYPE_CODES = {name: code for code, name in enumerate(GEOMETRY_TYPES)}
+
+# Nesting depth of the coordinate lists for each geometry type
+# (0 = one position, 1 = list of positions, 2 = list of rings, ...)
+DEPTHS = {'Point': 0, 'LineString': 1, 'MultiPoint': 1, 'Polygon': 2, 'MultiLineString': 2,
+          'MultiPolygon': 3}
+
+FLOAT64 = 0
+QUANTIZED = 1
+
+
+def encode_geometry(geometry, precision=None):
+    """Encode a GeoJSON geometry dict into a compact binary blob.
+
+    With precision=None coordinates are stored as raw float64 values and the
+    round trip is lossless. With an integer precision coordinates are rounded
+    to that many decimal places and stored as zigzag varint deltas, which is
+    typically 5-10x smaller than the JSON text.
+    """
+    out = bytearray(MAGIC)
+    mode = FLOAT64 if precision is None else QUANTIZED
+    out += struct.pack('<BBB', VERSION, mode, precision or 0)
+    _encode_body(geometry, mode, precision, out)
+    return bytes(out)
+
+
+def decode_geometry(blob):
+    """Decode a blob produced by encode_geometry back into a GeoJSON dict."""
+    if blob[:2] != MAGIC:
+        raise ValueError("Not an encoded geometry")
+    version, mode, precision = struct.unpack_from('<BBB', blob, 2)
+    if version != VERSION:
+        raise ValueError(f"Unsupported geometry encoding version {version}")
+    geometry, _ = _decode_body(blob, 5, mode, precision)
+    return geometry
+
+
+def is_encoded_geometry(data):
+    """Check whether a stored value is a binary encoded geometry."""
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:2]) == MAGIC
+
+
+def _encode_body(geometry, mode, precision, out):
+    geometry_type = geometry['type']
+    out.append(TYPE_CODES[geometry_type])
+    if geometry_type == 'GeometryCollection':
+        members = geometry['geometries']
+        _write_varint(len(members), out)
+        for member in members:
+            _encode_body(member, mode, precision, out)
+        return
+
+    depth = DEPTHS[geometry_type]
+    coordinates = geometry['coordinates']
+    positions = []
+    _flatten(coordinates, depth, out, positions)
+    dims = len(positions[0]) if positions else 2
+    out.append(dims)
+    _write_varint(len(positions), out)
+
+    if mode == FLOAT64:
+        values = array('d', (value for position in positions for value in position))
+        if sys.byteorder != 'little':
+            values.byteswap()
+        out += values.tobytes()
+    else:
+        scale = 10 ** precision
+        previous = [0] * dims
+        for position in positions:
+            for i in range(dims):
+                value = round(position[i] * scale)
+                delta = value - previous[i]
+                previous[i] = value
+                _write_varint((delta << 1) ^ (delta >> 63), out)
+
+
+def _flatten(coordinates, depth, out, positions):
+    """Write the list lengths for the nesting structure and collect positions."""
+    if depth == 0:
+        positions.append(coordinates)
+        return
+    if depth == 1:
+        _write_varint(len(coordinates), out)
+        positions.extend(coordinates)
+        return
+    _write_varint(len(coordinates), out)
+    for part in coordinates:
+        _flatten(part, depth - 1, out, positions)
+
+
+def _decode_body(blob, offset, mode, precision):
+    geometry_type = GEOMETRY_TYPES[blob[offset]]
+    offset += 1
+    if geometry_type == 'GeometryCollection':
+        count, offset = _read_varint(blob, offset)
+        members = []
+        for _ in range(count):
+            member, offset = _decode_body(blob, offset, mode, precision)
+            members.append(member)
+        return {'type': geometry_type, 'geometries': members}, offset
+
+    depth = DEPTHS[geometry_type]
+    structure, offset = _read_structure(blob, offset, depth)
+    dims = blob[offset]
+    offset += 1
+    total, offset = _read_varint(blob, offset)
+
+    if mode == FLOAT64:
+        values = array('d')
+        end = offset + total * dims * 8
+        values.frombytes(blob[offset:end])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        offset = end
+        values = values.tolist()
+    else:
+        scale = 10 ** precision
+        values = []
+        previous = [0] * dims
+        for _ in range(total):
+            for i in range(dims):
+                encoded, offset = _read_varint(blob, offset)
+                previous[i] += (encoded >> 1) ^ -(encoded & 1)
+                values.append(previous[i] / scale)
+
+    # An empty Point has one position with no values
+    positions = iter([values[i * dims:(i + 1) * dims] for i in range(total)])
+    coordinates = _rebuild(structure, depth, positions)
+    return {'type': geometry_type, 'coordinates': coordinates}, offset
+
+
+def _read_structure(blob, offset, depth):
+    """Read the list lengths written by _flatten."""
+    if depth == 0:
+        return None, offset
+    count, offset = _read_varint(blob, offset)
+    if depth == 1:
+        return count, offset
+    parts = []
+    for _ in range(count):
+        part, offset = _read_structure(blob, offset, depth - 1)
+        parts.append(part)
+    return parts, offset
+
+
+def _rebuild(structure, depth, positions):
+    if depth == 0:
+        return next(positions)
+    if depth == 1:
+        return [next(positions) for _ in range(structure)]
+    return [_rebuild(part, depth - 1, positions) for part in structure]
+
+
+def _write_varint(value, out):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(blob, offset):
+    result = 0
+    shift = 0
+    while True:
+        byte = blob[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
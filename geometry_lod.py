@@ -0,0 +1,69 @@
+# (min zoom, Douglas-Peucker tolerance in degrees). Each tolerance is about half
+# a screen pixel at the deepest zoom the level is used for; from
+# FULL_DETAIL_ZOOM on the full-resolution boundary is shown.
+LOD_LEVELS = ((0, 0.02), (6, 0.003), (9, 0.0005))
+FULL_DETAIL_ZOOM = 12
+
+
+def simplify_geometry(geometry, tolerance):
+    """Simplify a GeoJSON geometry, keeping polygons valid; None if nothing is left."""
+    from shapely.geometry import mapping, shape
+    simplified = shape(geometry).simplify(tolerance, preserve_topology=True)
+    if simplified.is_empty:
+        return None
+    return mapping(simplified)
+
+
+def geometry_bbox(geometry):
+    """Return (west, south, east, north) of a GeoJSON geometry, or None if it is empty."""
+    positions = []
+    _collect_positions(geometry, positions)
+    if not positions:
+        return None
+    lons = [position[0] for position in positions]
+    lats = [position[1] for position in positions]
+    return min(lons), min(lats), max(lons), max(lats)
+
+
+def _collect_positions(geometry, out):
+    if geometry['type'] == 'GeometryCollection':
+        for member in geometry['geometries']:
+            _collect_positions(member, out)
+        return
+    stack = [geometry['coordinates']]
+    while stack:
+        item = stack.pop()
+        if item and isinstance(item[0], (int, float)):
+            out.append(item)
+        else:
+            stack.extend(item)
+
+
+def build_lods(geometry, levels=LOD_LEVELS):
+    """Precompute the simplified variants of a boundary for map rendering.
+
+    Returns a list of [min_zoom, geometry] pairs, coarsest first.
+    """
+    if not geometry:
+        return []
+    lods = []
+    for min_zoom, tolerance in levels:
+        simplified = simplify_geometry(geometry, tolerance)
+        if simplified is not None:
+            lods.append([min_zoom, simplified])
+    return lods
+
+
+def level_for_zoom(lods, zoom):
+    """Pick the variant to draw at a zoom level from a place's LODs.
+
+    Returns (min_zoom, geometry); geometry is None when the full-resolution
+    boundary should be drawn.
+    """
+    chosen = (FULL_DETAIL_ZOOM, None)
+    if zoom >= FULL_DETAIL_ZOOM:
+        return chosen
+    for min_zoom, geometry in lods:
+        if min_zoom <= zoom:
+            chosen = (min_zoom, geometry)
+    return chosen
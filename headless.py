@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+from PlaceDataManager import PlaceDataManager
+from TravelMap import TravelMap
+from render_cache import RenderCache
+from place_store import GEOMETRY_KEYS, normalize_name
+from tracing import tracer
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class CatalogueService:
+    """The catalogue operations of the app, without Qt, safe to call from many threads
+
+    One PlaceDataManager, render cache and set of geo caches are shared by
+    every caller. Geocoding and boundary lookups run without holding the
+    catalogue lock, so several adds proceed at once; reads work on a
+    snapshot taken under the lock.
+    """
+
+    def __init__(self, data_manager=None, render_cache=None):
+        self.data_manager = data_manager or PlaceDataManager()
+        self.render_cache = render_cache or RenderCache()
+        self.lock = threading.Lock()
+        self.pending = set()
+
+    @staticmethod
+    def summary(place):
+        """A place's metadata without its geometry, for listings"""
+        return {k: v for k, v in dict.items(place) if k not in GEOMETRY_KEYS}
+
+    def list_places(self, year=None, source=None, prefix=None):
+        """Metadata of the places matching every given filter, in catalogue order."""
+        with self.lock:
+            if year is not None:
+                places = self.data_manager.get_places_by_year(year)
+            elif source is not None:
+                places = self.data_manager.get_places_by_source(source)
+            else:
+                places = list(self.data_manager.get_all_places())
+        if source is not None:
+            places = [p for p in places if p.get('boundary_source') == source]
+        if prefix:
+            prefix = normalize_name(prefix)
+            places = [p for p in places if normalize_name(p['name']).startswith(prefix)]
+        return [self.summary(p) for p in places]
+
+    def get_place(self, name):
+        """A place with its full boundary, or None."""
+        with self.lock:
+            place = self.data_manager.get_place(name)
+        if place is None:
+            return None
+        return dict(self.summary(place), boundaries=place.get('boundaries'))
+
+    def add_place(self, name):
+        """Resolve and store a place, returning its metadata.
+
+        Raises ValueError if the place is already added (or being added) and
+        Exception if it cannot be resolved.
+        """
+        key = normalize_name(name)
+        with self.lock:
+            if key in self.pending or self.data_manager.place_exists(name):
+                raise ValueError(f"'{name}' is already added.")
+            self.pending.add(key)
+        try:
+            with tracer.span('add_place', place=name):
+                place = self.data_manager.resolve_place(name)
+                with self.lock:
+                    self.data_manager.store_place(place)
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+        return self.summary(place)
+
+    def remove_place(self, name):
+        """Remove a place, returning whether it existed."""
+        with self.lock:
+            return self.data_manager.remove_place(name)
+
+    def render(self, dark_mode=False, markers=True, style_by=None, cluster=False):
+        """Render the whole catalogue as a standalone map page.
+
+        Full boundaries are inlined, since there is no map bridge or tile
+        server for the page to fetch them from.
+        """
+        travel_map = TravelMap(dark_mode=dark_mode, markers=markers, style_by=style_by, cluster=cluster)
+        with self.lock:
+            places = list(self.data_manager.get_all_places())
+            key = (self.data_manager.catalogue_version(),) + travel_map.render_key()
+
+        def render():
+            travel_map.add_all_places(places)
+            return travel_map.to_html()
+
+        return self.render_cache.get_or_render(key, render)
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+REASONS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           422: "Unprocessable Entity", 500: "Internal Server Error"}
+
+
+class CatalogueServer:
+    """Minimal asyncio HTTP/1.1 API over a CatalogueService
+
+        GET    /places?year=&source=&prefix=   list place metadata
+        GET    /places/<name>                  one place with its boundary
+        POST   /places  {"name": "Paris, France"}
+        DELETE /places/<name>
+        GET    /map?dark=1&style_by=year&cluster=1&markers=0   rendered page
+        GET    /diagnostics                    tracer summary
+
+    Requests are parsed on the event loop and the service calls run on a
+    thread pool, so slow lookups do not block other clients.
+    """
+
+    def __init__(self, service, workers=8):
+        self.service = service
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalogue")
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.handle, host, port)
+        for sock in server.sockets:
+            print(f"Serving the travel catalogue on http://{sock.getsockname()[0]}:{sock.getsockname()[1]}")
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        try:
+            try:
+                method, path, query, body = await self.read_request(reader)
+                status, content_type, data = await self.route(method, path, query, body)
+            except HttpError as e:
+                status, content_type, data = e.status, "application/json", self.json_bytes({'error': str(e)})
+            except Exception as e:
+                print(f"Request failed: {e}")
+                status, content_type, data = 500, "application/json", self.json_bytes({'error': str(e)})
+            head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n")
+            writer.write(head.encode("latin-1") + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(request_line[1])
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        return request_line[0].upper(), unquote(url.path), query, body
+
+    def call(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def route(self, method, path, query, body):
+        parts = [part for part in path.split("/") if part]
+        if parts == ["places"] and method == "GET":
+            year = query.get("year")
+            if year is not None and not year.isdigit():
+                raise HttpError(400, "year must be a number")
+            places = await self.call(self.service.list_places, int(year) if year else None,
+                                     query.get("source"), query.get("prefix"))
+            return 200, "application/json", self.json_bytes(places)
+        if parts == ["places"] and method == "POST":
+            try:
+                name = json.loads(body or b"{}").get("name", "").strip()
+            except (ValueError, AttributeError):
+                raise HttpError(400, "Expected a JSON object with a 'name'")
+            if not name:
+                raise HttpError(400, "Place name cannot be empty.")
+            try:
+                place = await self.call(self.service.add_place, name)
+            except ValueError as e:
+                raise HttpError(409, str(e))
+            except Exception as e:
+                raise HttpError(422, str(e))
+            return 201, "application/json", self.json_bytes(place)
+        if len(parts) == 2 and parts[0] == "places":
+            if method == "GET":
+                place = await self.call(self.service.get_place, parts[1])
+                if place is None:
+                    raise HttpError(404, f"{parts[1]} not found.")
+                return 200, "application/json", self.json_bytes(place)
+            if method == "DELETE":
+                if not await self.call(self.service.remove_place, parts[1]):
+                    raise HttpError(404, f"{parts[1]} not found.")
+                return 204, "application/json", b""
+        if parts == ["map"] and method == "GET":
+            style_by = query.get("style_by") or None
+            if style_by not in TravelMap.STYLE_PROPERTIES:
+                raise HttpError(400, f"Unknown style property: {style_by}")
+            html = await self.call(self.service.render, query.get("dark") == "1", query.get("markers") != "0",
+                                   style_by, query.get("cluster") == "1")
+            return 200, "text/html; charset=utf-8", html.encode("utf-8")
+        if parts == ["diagnostics"] and method == "GET":
+            return 200, "text/plain; charset=utf-8", tracer.summary_text().encode("utf-8")
+        if parts and parts[0] in ("places", "map", "diagnostics"):
+            raise HttpError(405, f"{method} is not supported on {path}")
+        raise HttpError(404, f"No such resource: {path}")
+
+    @staticmethod
+    def json_bytes(data):
+        return json.dumps(data).encode("utf-8")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage and render the travel catalogue without the GUI.")
+    parser.add_argument("--db", default="places_db.sqlite", help="Place database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="List places, optionally filtered")
+    list_parser.add_argument("--year", type=int, help="Only places visited in this year")
+    list_parser.add_argument("--source", help="Only places whose boundary came from this source")
+    list_parser.add_argument("--prefix", help="Only places whose name starts with this")
+    list_parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    show = commands.add_parser("show", help="Print one place, with its boundary, as JSON")
+    show.add_argument("name")
+    add = commands.add_parser("add", help="Add places")
+    add.add_argument("names", nargs="+", help='Place names, e.g. "Paris, France"')
+    remove = commands.add_parser("remove", help="Remove places")
+    remove.add_argument("names", nargs="+")
+    render = commands.add_parser("render", help="Render the map page to a file")
+    render.add_argument("output", help="HTML file to write")
+    render.add_argument("--dark", action="store_true", help="Use the dark map theme")
+    render.add_argument("--no-markers", action="store_true", help="Draw outlines only")
+    render.add_argument("--style-by", choices=[p for p in TravelMap.STYLE_PROPERTIES if p],
+                        help="Colour outlines by this property")
+    render.add_argument("--cluster", action="store_true", help="Cluster the markers")
+    serve = commands.add_parser("serve", help="Serve the catalogue over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--workers", type=int, default=8, help="Threads for lookups and rendering")
+    args = parser.parse_args(argv)
+
+    service = CatalogueService(PlaceDataManager(db_file=args.db))
+    status = 0
+    if args.command == "list":
+        places = service.list_places(args.year, args.source, args.prefix)
+        if args.json:
+            print(json.dumps(places, indent=2))
+        else:
+            for place in places:
+                print(f"{place['name']:<40} {place.get('year') or '':<6} {place.get('boundary_source') or ''}")
+    elif args.command == "show":
+        place = service.get_place(args.name)
+        if place is None:
+            print(f"{args.name} not found.", file=sys.stderr)
+            status = 1
+        else:
+            print(json.dumps(place, indent=2))
+    elif args.command == "add":
+        for name in args.names:
+            try:
+                service.add_place(name)
+                print(f"Added {name} in {tracer.breakdown('resolve_place', place=name)}")
+            except Exception as e:
+                print(f"{name}: {e}", file=sys.stderr)
+                status = 1
+    elif args.command == "remove":
+        for name in args.names:
+            if service.remove_place(name):
+                print(f"Removed {name}")
+            else:
+                print(f"{name} not found.", file=sys.stderr)
+                status = 1
+    elif args.command == "render":
+        html = service.render(args.dark, not args.no_markers, args.style_by, args.cluster)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"Wrote {args.output}")
+    else:
+        try:
+            asyncio.run(CatalogueServer(service, args.workers).serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+
+def measure_imports(target, python=sys.executable):
+    """Import a module (or run a script's module-level code) under `python -X importtime`.
+
+    Returns (entries, seconds): one (name, self_us, cumulative_us, depth)
+    tuple per imported module in import order, and the wall time of the run.
+    """
+    if target.endswith(".py"):
+        # Run as a plain module, not __main__, so no window is opened
+        path = os.path.abspath(target)
+        code = (f"import sys, runpy; sys.path.insert(0, {os.path.dirname(path)!r}); "
+                f"runpy.run_path({path!r})")
+    else:
+        code = f"import {target}"
+    started = time.perf_counter()
+    result = subprocess.run([python, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    seconds = time.perf_counter() - started
+    entries = []
+    errors = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    if result.returncode != 0:
+        raise RuntimeError("\n".join(errors[-20:]) or f"{target} failed to import")
+    return entries, seconds
+
+
+def by_package(entries):
+    """Total self time per top-level package, in microseconds."""
+    totals = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        totals[name.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def print_report(target, entries, seconds, top=20):
+    total_us = sum(self_us for _, self_us, _, _ in entries)
+    print(f"{target}: {len(entries)} modules, {total_us / 1000:.0f} ms importing, {seconds:.2f} s wall time")
+
+    print("\nSlowest packages (self time summed over their modules):")
+    for package, self_us in by_package(entries)[:top]:
+        print(f"  {self_us / 1000:9.1f} ms  {package}")
+
+    # Modules imported directly by the target (or its first-party modules), heaviest first
+    direct = [entry for entry in entries if entry[3] <= 1]
+    print(f"\nSlowest imports made by {target} (cumulative):")
+    for name, _, cumulative_us, depth in sorted(direct, key=lambda entry: entry[2], reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {'  ' * depth}{name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show where startup time goes in module imports.")
+    parser.add_argument("targets", nargs="*", default=["main"],
+                        help="Module names or .py files to import (default: main)")
+    parser.add_argument("--top", type=int, default=20, help="Number of rows per table")
+    parser.add_argument("--python", default=sys.executable, help="Interpreter to measure with")
+    args = parser.parse_args(argv)
+
+    status = 0
+    for target in args.targets:
+        try:
+            entries, seconds = measure_imports(target, args.python)
+        except RuntimeError as e:
+            print(f"Could not import {target}:\n{e}", file=sys.stderr)
+            status = 1
+            continue
+        print_report(target, entries, seconds, args.top)
+        print()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
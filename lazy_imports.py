@@ -0,0 +1,28 @@
+import importlib
+import threading
+
+# The geo stack (pandas, numpy, GDAL bindings, ...) takes seconds to import.
+# The apps import it on first use, and warm it up from a background thread
+# once the window is showing, so the first add or render does not wait for it.
+GEO_MODULES = ("folium", "geopy.geocoders", "shapely.geometry", "osmnx")
+
+
+def preload(modules=GEO_MODULES):
+    """Import modules one after another, reporting (not raising) failures."""
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Could not preload {name}: {e}")
+
+
+def preload_in_background(modules=GEO_MODULES, then=None):
+    """Run preload() on a daemon thread, followed by then() if given."""
+    def run():
+        preload(modules)
+        if then:
+            then()
+
+    thread = threading.Thread(target=run, name="preload", daemon=True)
+    thread.start()
+    return thread
@@ -1,117 +1,22 @@
 import sys
 import os
-import folium
-from folium import Marker, GeoJson
-from geopy.geocoders import Nominatim
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QListWidget, QMessageBox
 )
 from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl
-import osmnx as ox
-import json
-
-
-class PlaceDataManager:
-    def __init__(self, db_file="places_db.json"):
-        self.db_file = db_file
-        self.geolocator = Nominatim(user_agent="travel_live_map_app")
-        self.places = self.load_places()
-
-    def load_places(self):
-        """Load places from the custom database file (JSON)."""
-        if os.path.exists(self.db_file):
-            with open(self.db_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return []
-
-    def save_places(self):
-        """Save the places to the custom database file (JSON)."""
-        with open(self.db_file, "w", encoding="utf-8") as f:
-            json.dump(self.places, f, indent=4)
-
-    def add_place(self, name):
-        """Add a new place to the database."""
-        try:
-            location = self.geolocator.geocode(name, geometry='geojson')
-            if not location:
-                raise ValueError("Could not find location")
-
-            boundaries = None
-            try:
-                city_name = name.split(',')[0].strip()
-                gdf = ox.geometries_from_place(city_name, tags={'boundary': 'administrative'})
-                gdf = gdf[gdf.geom_type.isin(['Polygon', 'MultiPolygon'])]
-                if not gdf.empty:
-                    boundaries = json.loads(gdf.geometry.iloc[0].to_json())
-            except Exception as e:
-                print(f"OSM boundary fetch failed: {e}")
-                if 'geojson' in location.raw:
-                    boundaries = location.raw['geojson']
-
-            place = {
-                'name': name,
-                'lat': location.latitude,
-                'lon': location.longitude,
-                'boundaries': boundaries
-            }
-            self.places.append(place)
-            self.save_places()  # Save to the custom database
-            return place
-
-        except Exception as e:
-            raise Exception(f"Geocoding error: {str(e)}")
-
-    def remove_place(self, name):
-        """Remove a place from the database."""
-        place_to_remove = None
-        for place in self.places:
-            if place['name'] == name:
-                place_to_remove = place
-                break
-        if place_to_remove:
-            self.places.remove(place_to_remove)
-            self.save_places()  # Save after removal
-            return True
-        return False
-
-    def get_all_places(self):
-        """Get all places stored in the custom database."""
-        return self.places
-
-
-
-class TravelMap:
-    def __init__(self):
-        self.map = folium.Map(location=[20, 0], zoom_start=2)
-
-    def add_place(self, place):
-        # Add marker
-        Marker(
-            location=[place['lat'], place['lon']],
-            popup=f"<b>{place['name']}</b>",
-            tooltip=place['name'],
-            icon=folium.Icon(color="blue")
-        ).add_to(self.map)
-
-        # Add boundary polygon if available
-        if place['boundaries']:
-            GeoJson(
-                place['boundaries'],
-                style_function=lambda x: {
-                    'fillColor': '#3388ff',
-                    'color': '#0055cc',
-                    'weight': 2,
-                    'fillOpacity': 0.4
-                }
-            ).add_to(self.map)
-
-    def to_html(self):
-        import io
-        data = io.BytesIO()
-        self.map.save(data, close_file=False)
-        return data.getvalue().decode()
+from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtCore import QUrl, QThreadPool
+from PlaceDataManager import PlaceDataManager
+from TravelMap import TravelMap
+from map_bridge import MapBridge
+from render_cache import RenderCache
+from lazy_imports import preload_in_background
+from tile_server import TILE_MODE_THRESHOLD, PlaceTileIndex, TileServer
+from place_store import normalize_name
+from place_worker import ResolvePlaceWorker
+from diagnostics_dialog import DiagnosticsDialog
+from tracing import tracer
 
 
 class TravelMapApp(QMainWindow):
@@ -121,8 +26,20 @@ class TravelMapApp(QMainWindow):
         self.setGeometry(100, 100, 1000, 600)
 
         self.data_manager = PlaceDataManager()
-        self.travel_map = TravelMap()
+        self.tile_server = None
+        if len(self.data_manager.get_all_places()) > TILE_MODE_THRESHOLD:
+            # Too many places to inline in the page; serve them as tiles instead
+            self.tile_server = TileServer(PlaceTileIndex()).start()
+        self.travel_map = TravelMap(lazy_detail=True, tile_server=self.tile_server, cluster=True)
+        self.render_cache = RenderCache()
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(4)
+        self.pending_places = set()
+        self.map_ready = False
+        self.pending_scripts = []
         self.init_ui()
+        # The geo libraries load while the user looks at the map
+        preload_in_background()
 
     def init_ui(self):
         main_widget = QWidget()
@@ -149,11 +66,22 @@ class TravelMapApp(QMainWindow):
         self.places_list = QListWidget()
         sidebar_layout.addWidget(self.places_list)
 
+        self.diagnostics_button = QPushButton("Diagnostics")
+        self.diagnostics_button.clicked.connect(self.show_diagnostics)
+        sidebar_layout.addWidget(self.diagnostics_button)
+
         main_layout.addWidget(sidebar)
 
         # Map view
         self.map_view = QWebEngineView()
+        self.map_view.loadFinished.connect(self.map_loaded)
+        # Full-resolution boundaries are fetched by the page when zoomed in
+        self.map_bridge = MapBridge(lambda key: self.travel_map.boundaries_json(key), self)
+        self.map_channel = QWebChannel(self.map_view.page())
+        self.map_channel.registerObject("mapBridge", self.map_bridge)
+        self.map_view.page().setWebChannel(self.map_channel)
         main_layout.addWidget(self.map_view)
+        self.travel_map.add_all_places(self.data_manager.get_all_places())
         self.update_map_view()
 
         # Load all places into the list at startup
@@ -165,28 +93,80 @@ class TravelMapApp(QMainWindow):
             self.places_list.addItem(place['name'])
 
     def update_map_view(self):
-        html = self.travel_map.to_html()
+        # Full reload; the page already contains every place, so queued scripts are dropped
+        self.map_ready = False
+        self.pending_scripts = []
+        # Restarting with an unchanged catalogue reuses the last page
+        key = (self.data_manager.catalogue_version(),) + self.travel_map.render_key()
+        html = self.travel_map.finish_page(self.render_cache.get_or_render(key, self.travel_map.cacheable_html))
         temp_file = "temp_map.html"
         with open(temp_file, "w", encoding="utf-8") as f:
             f.write(html)
         self.map_view.load(QUrl.fromLocalFile(os.path.abspath(temp_file)))
 
+    def map_loaded(self, ok):
+        self.map_ready = ok
+        if ok:
+            for script in self.pending_scripts:
+                self.map_view.page().runJavaScript(script)
+            self.pending_scripts = []
+
+    def run_map_script(self, script):
+        # Update the loaded page in place so pan and zoom are kept
+        if self.map_ready:
+            self.map_view.page().runJavaScript(script)
+        else:
+            self.pending_scripts.append(script)
+
     def add_place(self):
+        place_name = self.place_input.text().strip()
+        if not place_name:
+            QMessageBox.warning(self, "Input Error", "Place name cannot be empty.")
+            return
+        key = normalize_name(place_name)
+        if key in self.pending_places or self.data_manager.place_exists(place_name):
+            QMessageBox.warning(self, "Input Error", f"'{place_name}' is already added.")
+            return
+
+        # Geocoding and boundary lookups run on the thread pool; several adds can be queued
+        self.pending_places.add(key)
+        worker = ResolvePlaceWorker(place_name, self.data_manager.resolve_place)
+        worker.signals.progress.connect(self.place_progress)
+        worker.signals.finished.connect(self.place_resolved)
+        worker.signals.failed.connect(self.place_failed)
+        self.thread_pool.start(worker)
+        self.place_input.clear()
+        self.show_pending_status()
+
+    def place_progress(self, place_name, message):
+        self.statusBar().showMessage(message)
+
+    def place_resolved(self, place_name, place):
+        self.pending_places.discard(normalize_name(place_name))
         try:
-            place_name = self.place_input.text().strip()
-            if not place_name:
-                QMessageBox.warning(self, "Input Error", "Place name cannot be empty.")
-                return
-
-            place = self.data_manager.add_place(place_name)
-            self.travel_map.add_place(place)
-            self.update_map_view()
-
-            self.places_list.addItem(place_name)
-            self.place_input.clear()
-
+            self.data_manager.store_place(place)
         except Exception as e:
+            self.show_pending_status()
             QMessageBox.critical(self, "Error", str(e))
+            return
+        self.travel_map.add_place(place)
+        self.run_map_script(self.travel_map.add_place_script(place))
+        self.places_list.addItem(place_name)
+        timing = tracer.breakdown('resolve_place', place=place_name)
+        self.show_pending_status(f"Added {place_name} in {timing}." if timing else f"Added {place_name}.")
+
+    def place_failed(self, place_name, error):
+        self.pending_places.discard(normalize_name(place_name))
+        self.show_pending_status()
+        QMessageBox.critical(self, "Error", error)
+
+    def show_pending_status(self, message=""):
+        if self.pending_places:
+            message = f"{message} Looking up {len(self.pending_places)} place(s)...".strip()
+        self.statusBar().showMessage(message, 0 if self.pending_places else 3000)
+
+    def show_diagnostics(self):
+        DiagnosticsDialog(tracer, self).exec_()
 
     def remove_place(self):
         selected_item = self.places_list.currentItem()
@@ -194,9 +174,9 @@ class TravelMapApp(QMainWindow):
             place_name = selected_item.text()
             success = self.data_manager.remove_place(place_name)
             if success:
-                self.travel_map = TravelMap()  # Reset the map
-                self.load_places_list()  # Reload the places list
-                self.update_map_view()
+                self.travel_map.remove_place(place_name)
+                self.run_map_script(self.travel_map.remove_place_script(place_name))
+                self.places_list.takeItem(self.places_list.row(selected_item))
                 QMessageBox.information(self, "Success", f"{place_name} removed successfully.")
             else:
                 QMessageBox.warning(self, "Error", f"{place_name} not found.")
@@ -0,0 +1,17 @@
+from PyQt5.QtCore import QObject, pyqtSlot
+
+
+class MapBridge(QObject):
+    """Serves full-resolution boundaries to the map page over QWebChannel
+
+    Registered on the page's channel as "mapBridge". `boundaries_json` is
+    called with a normalised place name and returns the boundary as JSON.
+    """
+
+    def __init__(self, boundaries_json, parent=None):
+        super().__init__(parent)
+        self.boundaries_json = boundaries_json
+
+    @pyqtSlot(str, result=str)
+    def placeBoundaries(self, key):
+        return self.boundaries_json(key)
@@ -0,0 +1,83 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+
+def trigrams(text):
+    """Return the set of character trigrams of a normalised name (padded at the ends)."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Prebuilt index over the feature names of one boundary layer
+
+    Fuzzy lookups use trigram postings to pick a small set of candidates and
+    only score those with fuzzywuzzy, instead of scoring every name in the
+    layer. A sorted list of word suffixes serves prefix completion.
+    """
+
+    def __init__(self, names, max_candidates=50):
+        self.names = []
+        self.positions = []
+        self.max_candidates = max_candidates
+        self.postings = defaultdict(list)
+        completions = []
+        for position, name in enumerate(names):
+            if not isinstance(name, str) or not name.strip():
+                continue
+            normalised = " ".join(name.lower().split())
+            entry = len(self.names)
+            self.names.append(normalised)
+            self.positions.append(position)
+            for gram in trigrams(normalised):
+                self.postings[gram].append(entry)
+            # Every word start, so "del" completes both "Delhi" and "New Delhi"
+            for i, char in enumerate(normalised):
+                if i == 0 or (normalised[i - 1] == " " and char != " "):
+                    completions.append((normalised[i:], entry))
+        completions.sort()
+        self.completion_keys = [key for key, _ in completions]
+        self.completion_entries = [entry for _, entry in completions]
+        self.original_names = [names[position] for position in self.positions]
+
+    def __len__(self):
+        return len(self.names)
+
+    def candidates(self, query):
+        """Return the entries sharing the most trigrams with the query."""
+        counts = Counter()
+        for gram in trigrams(query):
+            counts.update(self.postings.get(gram, ()))
+        return [entry for entry, _ in counts.most_common(self.max_candidates)]
+
+    def extract_one(self, query, score_cutoff=80):
+        """Fuzzy-match a query, returning (normalised name, score, row position) or None."""
+        from fuzzywuzzy import process
+        query = " ".join(query.lower().split())
+        entries = self.candidates(query)
+        if not entries:
+            return None
+        choices = {entry: self.names[entry] for entry in entries}
+        match = process.extractOne(query, choices, score_cutoff=score_cutoff)
+        if match is None:
+            return None
+        name, score, entry = match
+        return name, score, self.positions[entry]
+
+    def complete(self, prefix, limit=10):
+        """Return up to `limit` original names with a word starting with prefix."""
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        i = bisect_left(self.completion_keys, prefix)
+        while i < len(self.completion_keys) and self.completion_keys[i].startswith(prefix):
+            entry = self.completion_entries[i]
+            if entry not in seen:
+                seen.add(entry)
+                results.append(self.original_names[entry])
+                if len(results) >= limit:
+                    break
+            i += 1
+        return results
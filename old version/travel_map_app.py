@@ -1,298 +1,454 @@
 import sys
 import os
-import folium
-from folium import GeoJson
-from geopy.geocoders import Nominatim
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QListWidget, QMessageBox,
-    QFrame, QSplitter, QListWidgetItem
+    QFrame, QSplitter, QListWidgetItem, QCompleter
 )
 from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl, Qt
+from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtCore import QUrl, Qt, QThreadPool, QStringListModel
 from PyQt5.QtGui import QFont
-import osmnx as ox
-import json
-import pickle
 import tempfile
-import requests
-import pycountry
-from fuzzywuzzy import process
-import geopandas as gpd
-from shapely.geometry import Point
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from style_manager import StyleManager
 
+# Shared modules (storage, caches) live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from place_store import PlaceStore
+from place_index import PlaceIndex
+from geocode_cache import GeocodeCache
+from geocoding_service import GeocodingService
+from place_store import normalize_name
+from place_worker import ResolvePlaceWorker
+from boundary_layers import BoundaryLayers
+from geoboundaries_cache import GeoBoundariesCache
+from osm_boundary_cache import OSMBoundaryCache
+from geometry_lod import build_lods
+from tracing import tracer
+from diagnostics_dialog import DiagnosticsDialog
+from TravelMap import TravelMap
+from map_bridge import MapBridge
+from render_cache import RenderCache
+from lazy_imports import GEO_MODULES, preload_in_background
+from tile_server import TILE_MODE_THRESHOLD, PlaceTileIndex, TileServer
+
 class PlaceDataManager:
     """Manages place data persistence and retrieval"""
 
-    def __init__(self, db_file="places_db.json", boundaries_file=r"C:\Users\Jalpan\Desktop\digina\data\india_boundaries.gpkg"):
+    # Scores for point-in-polygon hits in the local GeoPackage layers
+    LOCAL_LAYER_SCORES = {
+        'ADM_ADM_0': 80,
+        'ADM_ADM_2': 85,
+        'ADM_ADM_1': 82,
+        'ADM_ADM_3': 78
+    }
+
+    # Seconds each boundary source may run before its result is ignored
+    SOURCE_TIMEOUTS = {
+        'geoBoundaries': 60,
+        'Local dataset': 10,
+        'OSM': 45,
+        'geopy': 5
+    }
+
+    def __init__(self, db_file="places_db.sqlite", boundaries_file=r"C:\Users\Jalpan\Desktop\digina\data\india_boundaries.gpkg",
+                 legacy_db_file="places_db.json", geometry_format="json", precision=None,
+                 geocode_cache_file="geocode_cache.sqlite", score_threshold=85):
         self.db_file = db_file
-        self.geolocator = Nominatim(user_agent="travel_live_map_app")
+        self.store = PlaceStore(db_file, geometry_format=geometry_format, precision=precision)
+        if legacy_db_file:
+            self.store.migrate_from_json(legacy_db_file)
         self.places = self.load_places()
-        self.geocode_cache = self.load_geocode_cache()
-        # Load local boundaries dataset and discover available layers
+        self.geocode_cache = GeocodeCache(geocode_cache_file)
+        self.geocoder = GeocodingService(cache=self.geocode_cache, rate=1.0, geometry='geojson')
+        self.geoboundaries = GeoBoundariesCache()
+        self.osm_cache = OSMBoundaryCache()
+        # Stop waiting for slower boundary sources once a result scores this high
+        self.score_threshold = score_threshold
+        self.source_timings = {}
+        # Local boundaries dataset; each layer is loaded (or read from the
+        # simplified-layer cache) the first time a lookup needs it
         self.boundaries_file = boundaries_file
-        self.boundaries_gdfs = {}
-        try:
-            # Discover all layers in the GeoPackage
-            layers = gpd.list_layers(boundaries_file)
-            layer_names = layers['name'].tolist()
-            print(f"Available layers in GeoPackage: {layer_names}")
-            # Define layer priority and expected names
-            layer_priority = [
-                ('ADM_ADM_0', 0),  # Country-level
-                ('ADM_ADM_2', 2),  # District-level
-                ('ADM_ADM_1', 1),  # State/region-level
-                ('ADM_ADM_3', 3)   # Sub-district-level
-            ]
-            for layer_name, adm_level in layer_priority:
-                if layer_name in layer_names:
-                    try:
-                        gdf = gpd.read_file(boundaries_file, layer=layer_name, columns=['NAME_2', 'NAME_1', 'NAME_0', 'geometry'])
-                        # Simplify geometries to reduce memory usage
-                        gdf['geometry'] = gdf['geometry'].simplify(tolerance=0.001, preserve_topology=True)
-                        self.boundaries_gdfs[layer_name] = gdf
-                        print(f"Loaded layer '{layer_name}' with {len(gdf)} features")
-                        print(f"Columns in layer '{layer_name}': {list(gdf.columns)}")
-                    except Exception as e:
-                        print(f"Error loading layer '{layer_name}': {e}")
-            if not self.boundaries_gdfs:
-                print("No valid layers loaded from GeoPackage")
-        except Exception as e:
-            print(f"Error accessing GeoPackage: {e}")
-            self.boundaries_gdfs = {}
+        self.boundary_indexes = BoundaryLayers(
+            boundaries_file,
+            layer_priority=[
+                'ADM_ADM_0',  # Country-level
+                'ADM_ADM_2',  # District-level
+                'ADM_ADM_1',  # State/region-level
+                'ADM_ADM_3'   # Sub-district-level
+            ],
+            name_column=self.layer_name_column,
+            columns=['NAME_2', 'NAME_1', 'NAME_0', 'geometry'],
+            tolerance=0.001
+        )
+
+    @staticmethod
+    def layer_name_column(layer_name):
+        """Return the column holding feature names for a GeoPackage layer."""
+        return {
+            'ADM_ADM_0': 'NAME_0',
+            'ADM_ADM_1': 'NAME_1',
+            'ADM_ADM_2': 'NAME_2'
+        }.get(layer_name, 'NAME_3')
 
     def load_places(self):
-        """Load places from the custom database file (JSON)."""
-        if os.path.exists(self.db_file):
-            try:
-                with open(self.db_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(f"Error decoding JSON from {self.db_file}")
-                return []
-        return []
+        """Load places from the place store (SQLite) into the in-memory index."""
+        with tracer.span('load_places') as span:
+            places = PlaceIndex(self.store.load_all())
+            span['places'] = len(places)
+        return places
 
     def save_places(self):
-        """Save the places to the custom database file (JSON)."""
+        """Rewrite the whole catalogue; add/remove only write the changed place."""
         try:
-            with open(self.db_file, "w", encoding="utf-8") as f:
-                json.dump(self.places, f, indent=4)
+            self.store.replace_all(self.places)
         except Exception as e:
             print(f"Error saving places: {e}")
 
-    def load_geocode_cache(self):
-        """Load geocoding cache from file."""
-        cache_file = "geocode_cache.pkl"
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, "rb") as f:
-                    return pickle.load(f)
-            except:
-                return {}
-        return {}
-
-    def save_geocode_cache(self):
-        """Save geocoding cache to file."""
-        try:
-            with open("geocode_cache.pkl", "wb") as f:
-                pickle.dump(self.geocode_cache, f)
-        except Exception as e:
-            print(f"Error saving geocode cache: {e}")
+    def geocode(self, name):
+        """Geocode a place name, using the persistent cache when possible."""
+        with tracer.span('geocode', query=name):
+            return self.geocoder.geocode(name)
 
     def add_place(self, name, year=None):
         """Add a new place to the database using multiple data sources, merging geopy results."""
+        with tracer.span('add_place', place=name):
+            return self.store_place(self.resolve_place(name, year))
+
+    def store_place(self, place):
+        """Add a place returned by resolve_place to the database."""
+        self.places.add(place)
+        self.store.put(place)
+        return place
+
+    def resolve_place(self, name, year=None, progress=None):
+        """Geocode a place and pick its best boundary without storing it.
+
+        Safe to call from a worker thread; `progress(message)` is called as
+        each stage starts.
+        """
+        from shapely.geometry import Point
         try:
-            # Check geocoding cache
-            name_key = name.lower()
-            if name_key in self.geocode_cache:
-                location = self.geocode_cache[name_key]
-            else:
-                location = self.geolocator.geocode(name, geometry='geojson')
-                if location:
-                    self.geocode_cache[name_key] = location
-                    self.save_geocode_cache()
-                else:
+            with tracer.span('resolve_place', place=name):
+                if progress:
+                    progress(f"Locating {name}...")
+                location = self.geocode(name)
+                if not location:
                     raise ValueError(f"Could not find location: {name}")
 
-            city_name = name.split(',')[0].strip()
-            country_name = name.split(',')[-1].strip() if ',' in name else city_name
-            point = Point(location.longitude, location.latitude)
-            print(f"Searching boundaries for {city_name}")
+                city_name = name.split(',')[0].strip()
+                country_name = name.split(',')[-1].strip() if ',' in name else city_name
+                point = Point(location.longitude, location.latitude)
+                print(f"Searching boundaries for {city_name}")
+                if progress:
+                    progress(f"Searching boundaries for {city_name}...")
+
+                # Query all boundary sources concurrently
+                with tracer.span('resolve_boundaries'):
+                    boundary_results = self.resolve_boundaries(name, city_name, country_name, location, point)
+
+                # Select the best boundary
+                if boundary_results:
+                    # Sort by score (higher is better)
+                    best_result = max(boundary_results, key=lambda x: x['score'])
+                    boundaries = best_result['geometry']
+                    source = best_result['source']
+                    print(f"Selected boundary from {source} with score {best_result['score']}")
+                else:
+                    raise ValueError(f"Could not find boundaries for {name}")
+
+                # Get current year if none provided
+                import datetime
+                current_year = datetime.datetime.now().year
+                visit_year = year if year else current_year
+
+                with tracer.span('build_lods'):
+                    lods = build_lods(boundaries)
+                return {
+                    'name': name,
+                    'lat': location.latitude,
+                    'lon': location.longitude,
+                    'boundaries': boundaries,
+                    'lods': lods,
+                    'year': visit_year,
+                    'is_estimated_boundary': False,
+                    'boundary_source': source
+                }
 
-            # Store results from all sources
-            boundary_results = []
+        except Exception as e:
+            raise Exception(str(e))
 
-            # 1. geoBoundaries API (district-level, ADM2)
+    def resolve_boundaries(self, name, city_name, country_name, location, point):
+        """Query every boundary source concurrently and return their results.
+
+        Each source has its own timeout (SOURCE_TIMEOUTS); the local dataset's
+        restarts once its layers are loaded, since a layer's first load can take
+        longer than the lookup itself. As soon as a result scores at least
+        `score_threshold` the remaining sources are cancelled:
+        queued ones never start and running ones stop at their next check.
+        Per-source timings are kept in self.source_timings[name], and each
+        source is traced as a 'boundary.<source>' span inside resolve_place.
+        """
+        def layers_loaded():
+            deadlines['Local dataset'] = time.perf_counter() + self.SOURCE_TIMEOUTS['Local dataset']
+
+        sources = {
+            'geoBoundaries': lambda cancelled: self.geoboundaries_boundaries(city_name, country_name, point, cancelled),
+            'Local dataset': lambda cancelled: self.local_boundaries(city_name, point, cancelled, layers_loaded),
+            'OSM': lambda cancelled: self.osm_boundaries(name, city_name, point, cancelled),
+            'geopy': lambda cancelled: self.geopy_boundaries(city_name, location, cancelled)
+        }
+        cancelled = threading.Event()
+        timings = {}
+        boundary_results = []
+        started = time.perf_counter()
+        # Keyed by source, so a source can restart its own clock (layers_loaded)
+        deadlines = {source: started + self.SOURCE_TIMEOUTS.get(source, 30) for source in sources}
+        executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="boundary-source")
+        parent = tracer.current()
+        futures = {executor.submit(self.run_boundary_source, source, fn, cancelled, timings, parent): source
+                   for source, fn in sources.items()}
+        pending = set(futures)
+        try:
+            while pending:
+                timeout = max(0, min(deadlines[futures[future]] for future in pending) - time.perf_counter())
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    boundary_results.extend(future.result())
+                now = time.perf_counter()
+                for future in [f for f in pending if deadlines[futures[f]] <= now]:
+                    pending.discard(future)
+                    timings[futures[future]] = {'seconds': now - started, 'status': 'timeout'}
+                    tracer.count('boundary.timeout')
+                    print(f"{futures[future]}: timed out")
+                if pending and boundary_results and max(r['score'] for r in boundary_results) >= self.score_threshold:
+                    print(f"Found a boundary scoring {self.score_threshold}+, cancelling slower sources")
+                    break
+        finally:
+            cancelled.set()
+            for future in pending:
+                if future.cancel():
+                    timings[futures[future]] = {'seconds': 0.0, 'status': 'cancelled'}
+                else:
+                    timings.setdefault(futures[future], {'seconds': time.perf_counter() - started,
+                                                         'status': 'cancelled'})
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.source_timings[name] = dict(timings)
+        print("Boundary source timings: " + ", ".join(
+            f"{source} {t['seconds']:.2f}s ({t['status']})" for source, t in timings.items()))
+        return boundary_results
+
+    def run_boundary_source(self, source, fn, cancelled, timings, parent=None):
+        """Run one boundary source and record how long it took."""
+        started = time.perf_counter()
+        with tracer.span(f'boundary.{source}', parent=parent) as span:
             try:
-                country = pycountry.countries.search_fuzzy(country_name)[0]
-                iso3_code = country.alpha_3
-                api_url = f"https://www.geoboundaries.org/api/current/gbOpen/{iso3_code}/ADM2/"
-                response = requests.get(api_url, timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('gjDownloadURL'):
-                        gdf = gpd.read_file(data['gjDownloadURL'])
-                        print(f"geoBoundaries: Checking {len(gdf)} ADM2 boundaries")
-                        # Point-in-polygon check
-                        for idx, row in gdf.iterrows():
-                            if row.geometry.contains(point):
-                                boundary_results.append({
-                                    'source': 'geoBoundaries',
-                                    'geometry': row.geometry.__geo_interface__,
-                                    'score': 90 if row.geometry.contains(point) else 70,
-                                    'name': row.get('shapeName', city_name)
-                                })
-                                print(f"geoBoundaries: Found boundary (point-in-polygon)")
-                                break
-                        # Fuzzy match if point-based search fails
-                        if not any(r['source'] == 'geoBoundaries' for r in boundary_results) and 'shapeName' in gdf.columns:
-                            names = gdf['shapeName'].str.lower().tolist()
-                            match = process.extractOne(city_name.lower(), names, score_cutoff=80)
-                            if match:
-                                boundary_results.append({
-                                    'source': 'geoBoundaries',
-                                    'geometry': gdf[gdf['shapeName'].str.lower() == match[0]].geometry.iloc[0].__geo_interface__,
-                                    'score': 70,
-                                    'name': match[0]
-                                })
-                                print(f"geoBoundaries: Found boundary (fuzzy match: {match[0]})")
+                results = fn(cancelled)
+                status = 'ok' if results else 'no result'
             except Exception as e:
-                print(f"geoBoundaries fetch failed: {e}")
-
-            # 2. Local boundaries dataset (check layers in order: ADM0, ADM2, ADM1, ADM3)
-            if self.boundaries_gdfs:
-                layer_priority = ['ADM_ADM_0', 'ADM_ADM_2', 'ADM_ADM_1', 'ADM_ADM_3']
-                for layer_name in layer_priority:
-                    if layer_name in self.boundaries_gdfs:
-                        try:
-                            gdf = self.boundaries_gdfs[layer_name]
-                            print(f"Local dataset ({layer_name}): Checking {len(gdf)} boundaries")
-                            # Determine name column based on layer
-                            name_col = 'NAME_2' if layer_name == 'ADM_ADM_2' else 'NAME_1' if layer_name == 'ADM_ADM_1' else 'NAME_0' if layer_name == 'ADM_ADM_0' else 'NAME_3'
-                            # Point-in-polygon check
-                            for idx, row in gdf.iterrows():
-                                if row.geometry.contains(point):
-                                    score = {
-                                        'ADM_ADM_0': 80,
-                                        'ADM_ADM_2': 85,
-                                        'ADM_ADM_1': 82,
-                                        'ADM_ADM_3': 78
-                                    }.get(layer_name, 65)
-                                    boundary_results.append({
-                                        'source': f'Local dataset ({layer_name})',
-                                        'geometry': row.geometry.__geo_interface__,
-                                        'score': score if row.geometry.contains(point) else score - 20,
-                                        'name': row.get(name_col, city_name)
-                                    })
-                                    print(f"Local dataset ({layer_name}): Found boundary (point-in-polygon)")
-                                    break
-                            # Fuzzy match if point-based search fails
-                            if not any(r['source'] == f'Local dataset ({layer_name})' for r in boundary_results) and name_col in gdf.columns:
-                                names = gdf[name_col].str.lower().tolist()
-                                match = process.extractOne(city_name.lower(), names, score_cutoff=80)
-                                if match:
-                                    score = {
-                                        'ADM_ADM_0': 60,
-                                        'ADM_ADM_2': 65,
-                                        'ADM_ADM_1': 62,
-                                        'ADM_ADM_3': 58
-                                    }.get(layer_name, 45)
-                                    boundary_results.append({
-                                        'source': f'Local dataset ({layer_name})',
-                                        'geometry': gdf[gdf[name_col].str.lower() == match[0]].geometry.iloc[0].__geo_interface__,
-                                        'score': score,
-                                        'name': match[0]
-                                    })
-                                    print(f"Local dataset ({layer_name}): Found boundary (fuzzy match: {match[0]})")
-                        except Exception as e:
-                            print(f"Local dataset ({layer_name}) fetch failed: {e}")
-
-            # 3. OSM boundaries
-            try:
-                gdf = ox.geometries_from_place(city_name, tags={'boundary': 'administrative'})
-                gdf = gdf[gdf.geom_type.isin(['Polygon', 'MultiPolygon'])]
-                if not gdf.empty:
-                    print(f"OSM: Checking {len(gdf)} boundaries")
-                    # Point-in-polygon check
-                    for idx, row in gdf.iterrows():
-                        if row.geometry.contains(point):
-                            boundary_results.append({
-                                'source': 'OSM',
-                                'geometry': row.geometry.__geo_interface__,
-                                'score': 80 if row.geometry.contains(point) else 60,
-                                'name': row.get('name', city_name)
-                            })
-                            print(f"OSM: Found boundary (point-in-polygon)")
-                            break
-                    # Take first valid boundary if point-based search fails
-                    if not any(r['source'] == 'OSM' for r in boundary_results):
+                print(f"{source} failed: {e}")
+                results, status = [], 'error'
+            span['result'] = 'cancelled' if cancelled.is_set() else status
+        if not cancelled.is_set():
+            timings.setdefault(source, {'seconds': time.perf_counter() - started, 'status': status})
+        return results
+
+    def geoboundaries_boundaries(self, city_name, country_name, point, cancelled):
+        """geoBoundaries API (district-level, ADM2)"""
+        import pycountry
+        boundary_results = []
+        country = pycountry.countries.search_fuzzy(country_name)[0]
+        iso3_code = country.alpha_3
+        # Served from the local dataset cache after the first download
+        index = self.geoboundaries.get(iso3_code, 'ADM2')
+        if cancelled.is_set():
+            return boundary_results
+        gdf = index.gdf
+        print(f"geoBoundaries: Checking {len(gdf)} ADM2 boundaries")
+        # Point-in-polygon check
+        row = index.locate_row(point)
+        if row is not None:
+            boundary_results.append({
+                'source': 'geoBoundaries',
+                'geometry': row.geometry.__geo_interface__,
+                'score': 90,
+                'name': row.get('shapeName', city_name)
+            })
+            print(f"geoBoundaries: Found boundary (point-in-polygon)")
+        # Fuzzy match if point-based search fails
+        if not boundary_results:
+            match = index.match_name(city_name, score_cutoff=80)
+            if match:
+                boundary_results.append({
+                    'source': 'geoBoundaries',
+                    'geometry': index.geometry_at(match[2]),
+                    'score': 70,
+                    'name': match[0]
+                })
+                print(f"geoBoundaries: Found boundary (fuzzy match: {match[0]})")
+        return boundary_results
+
+    def local_boundaries(self, city_name, point, cancelled, layers_loaded=None):
+        """Local boundaries dataset (check layers in order: ADM0, ADM2, ADM1, ADM3)
+
+        Layers not loaded yet (normally preloaded at startup) are loaded
+        first, after which layers_loaded() is called.
+        """
+        boundary_results = []
+        if len(self.boundary_indexes.loaded()) < len(self.boundary_indexes):
+            self.boundary_indexes.preload()
+            if layers_loaded:
+                layers_loaded()
+        layer_priority = ['ADM_ADM_0', 'ADM_ADM_2', 'ADM_ADM_1', 'ADM_ADM_3']
+        for layer_name in layer_priority:
+            if cancelled.is_set():
+                break
+            if layer_name in self.boundary_indexes:
+                try:
+                    index = self.boundary_indexes[layer_name]
+                    print(f"Local dataset ({layer_name}): Checking {len(index)} boundaries")
+                    name_col = self.layer_name_column(layer_name)
+                    # Point-in-polygon check through the layer's spatial index
+                    with tracer.span('local.locate', layer=layer_name):
+                        row = index.locate_row(point)
+                    if row is not None:
+                        score = self.LOCAL_LAYER_SCORES.get(layer_name, 65)
                         boundary_results.append({
-                            'source': 'OSM',
-                            'geometry': gdf.geometry.iloc[0].__geo_interface__,
-                            'score': 60,
-                            'name': gdf.get('name', city_name)
+                            'source': f'Local dataset ({layer_name})',
+                            'geometry': row.geometry.__geo_interface__,
+                            'score': score,
+                            'name': row.get(name_col, city_name)
                         })
-                        print(f"OSM: Found boundary (first available)")
-            except Exception as e:
-                print(f"OSM boundary fetch failed: {e}")
-
-            # 4. geopy GeoJSON
-            try:
-                if 'geojson' in location.raw and location.raw['geojson'].get('type') in ['Polygon', 'MultiPolygon']:
-                    boundary_results.append({
-                        'source': 'geopy',
-                        'geometry': location.raw['geojson'],
-                        'score': 75 if Point(location.longitude, location.latitude).within(gpd.GeoSeries([location.raw['geojson']]).iloc[0]) else 55,
-                        'name': city_name
-                    })
-                    print(f"geopy: Found boundary (GeoJSON)")
-                else:
-                    print(f"geopy GeoJSON is a {location.raw['geojson'].get('type') if 'geojson' in location.raw else 'missing'}, not a valid boundary")
-            except Exception as e:
-                print(f"geopy GeoJSON processing failed: {e}")
-
-            # Select the best boundary
-            if boundary_results:
-                # Sort by score (higher is better)
-                best_result = max(boundary_results, key=lambda x: x['score'])
-                boundaries = best_result['geometry']
-                source = best_result['source']
-                print(f"Selected boundary from {source} with score {best_result['score']}")
-            else:
-                raise ValueError(f"Could not find boundaries for {name}")
-
-            # Get current year if none provided
-            import datetime
-            current_year = datetime.datetime.now().year
-            visit_year = year if year else current_year
-
-            place = {
-                'name': name,
-                'lat': location.latitude,
-                'lon': location.longitude,
-                'boundaries': boundaries,
-                'year': visit_year,
-                'is_estimated_boundary': False,
-                'boundary_source': source
-            }
-            self.places.append(place)
-            self.save_places()
-            return place
+                        print(f"Local dataset ({layer_name}): Found boundary (point-in-polygon)")
+                    # Fuzzy match if point-based search fails
+                    if not any(r['source'] == f'Local dataset ({layer_name})' for r in boundary_results):
+                        with tracer.span('local.match_name', layer=layer_name):
+                            match = index.match_name(city_name, score_cutoff=80)
+                        if match:
+                            score = {
+                                'ADM_ADM_0': 60,
+                                'ADM_ADM_2': 65,
+                                'ADM_ADM_1': 62,
+                                'ADM_ADM_3': 58
+                            }.get(layer_name, 45)
+                            boundary_results.append({
+                                'source': f'Local dataset ({layer_name})',
+                                'geometry': index.geometry_at(match[2]),
+                                'score': score,
+                                'name': match[0]
+                            })
+                            print(f"Local dataset ({layer_name}): Found boundary (fuzzy match: {match[0]})")
+                except Exception as e:
+                    print(f"Local dataset ({layer_name}) fetch failed: {e}")
+        return boundary_results
+
+    def osm_boundaries(self, name, city_name, point, cancelled):
+        """OSM boundaries (cached per place, so re-adds skip Overpass)"""
+        osm_result = self.osm_cache.lookup(name, city_name, lambda: self.fetch_osm_boundary(city_name, point))
+        if not osm_result:
+            return []
+        return [{
+            'source': 'OSM',
+            'geometry': osm_result['geometry'],
+            'score': osm_result['score'],
+            'name': osm_result['name']
+        }]
+
+    def geopy_boundaries(self, city_name, location, cancelled):
+        """Boundary GeoJSON returned by the geocoder"""
+        import geopandas as gpd
+        from shapely.geometry import Point
+        if 'geojson' in location.raw and location.raw['geojson'].get('type') in ['Polygon', 'MultiPolygon']:
+            print(f"geopy: Found boundary (GeoJSON)")
+            return [{
+                'source': 'geopy',
+                'geometry': location.raw['geojson'],
+                'score': 75 if Point(location.longitude, location.latitude).within(gpd.GeoSeries([location.raw['geojson']]).iloc[0]) else 55,
+                'name': city_name
+            }]
+        print(f"geopy GeoJSON is a {location.raw['geojson'].get('type') if 'geojson' in location.raw else 'missing'}, not a valid boundary")
+        return []
 
-        except Exception as e:
-            raise Exception(str(e))
+    def fetch_osm_boundary(self, city_name, point):
+        """Query Overpass and pick the administrative boundary containing point (uncached)."""
+        import osmnx as ox
+        from boundary_index import BoundaryIndex
+        # osmnx geocodes the place through its own Nominatim client first, so the
+        # call takes a token from the geocoder's bucket to stay within the rate limit
+        self.geocoder.bucket.acquire()
+        gdf = ox.geometries_from_place(city_name, tags={'boundary': 'administrative'})
+        gdf = gdf[gdf.geom_type.isin(['Polygon', 'MultiPolygon'])]
+        if gdf.empty:
+            return None
+        print(f"OSM: Checking {len(gdf)} boundaries")
+        # Point-in-polygon check
+        row = BoundaryIndex(gdf, 'name', index_names=False).locate_row(point)
+        score = 80
+        if row is not None:
+            print(f"OSM: Found boundary (point-in-polygon)")
+        else:
+            # Take first valid boundary if point-based search fails
+            row = gdf.iloc[0]
+            score = 60
+            print(f"OSM: Found boundary (first available)")
+        osm_name = row.get('name', city_name)
+        return {
+            'geometry': row.geometry.__geo_interface__,
+            'score': score,
+            'name': osm_name if isinstance(osm_name, str) else city_name
+        }
+
+    def resolve_many(self, lat_lons):
+        """Find the containing local boundary of many (lat, lon) pairs at once.
+
+        Runs one spatial join per GeoPackage layer and returns a list with,
+        for each pair, {layer_name: {'position', 'name', 'score'}} for every
+        layer that has a containing feature.
+        """
+        results = [{} for _ in lat_lons]
+        for layer_name, index in self.boundary_indexes.items():
+            score = self.LOCAL_LAYER_SCORES.get(layer_name, 65)
+            for result, position in zip(results, index.locate_lat_lons(lat_lons)):
+                if position is not None:
+                    result[layer_name] = {
+                        'position': position,
+                        'name': index.name_at(position),
+                        'score': score
+                    }
+        return results
+
+    def refresh_local_boundaries(self):
+        """Re-resolve every place that uses a local dataset boundary, e.g. after a dataset update.
+
+        Returns the number of places whose boundary was updated.
+        """
+        places = [
+            place
+            for source in self.places.sources() if source.startswith('Local dataset')
+            for place in self.places.with_source(source)
+        ]
+        resolved = self.resolve_many([(p['lat'], p['lon']) for p in places])
+        updated = []
+        for place, hits in zip(places, resolved):
+            if not hits:
+                continue
+            layer_name, best = max(hits.items(), key=lambda item: item[1]['score'])
+            place['boundaries'] = self.boundary_indexes[layer_name].geometry_at(best['position'])
+            place['lods'] = build_lods(place['boundaries'])
+            place['boundary_source'] = f'Local dataset ({layer_name})'
+            self.places.add(place)  # re-index the new source
+            updated.append(place)
+        self.store.put_many(updated)
+        return len(updated)
 
     def remove_place(self, name):
         """Remove a place from the database."""
-        place_to_remove = None
-        for place in self.places:
-            if place['name'] == name:
-                place_to_remove = place
-                break
+        place_to_remove = self.places.remove(name)
         if place_to_remove:
-            self.places.remove(place_to_remove)
-            self.save_places()
+            self.store.delete(place_to_remove['name'])
             return True
         return False
 
@@ -300,64 +456,38 @@ class PlaceDataManager:
         """Get all places stored in the custom database."""
         return self.places
 
-class TravelMap:
-    """Manages the folium map and its features"""
-
-    def __init__(self, dark_mode=False):
-        self.dark_mode = dark_mode
-        self.map = self._create_map()
-
-    def _create_map(self):
-        """Create a new map with appropriate styling based on mode"""
-        if self.dark_mode:
-            return folium.Map(
-                location=[20, 0],
-                zoom_start=2,
-                tiles="cartodbdark_matter",
-                control_scale=True
-            )
-        else:
-            return folium.Map(
-                location=[20, 0],
-                zoom_start=2,
-                control_scale=True
-            )
-
-    def reset(self):
-        """Reset the map to initial state"""
-        self.map = self._create_map()
-
-    def add_place(self, place):
-        """Add a place to the map with boundaries only"""
-        if place['boundaries']:
-            color = '#46CDCF' if self.dark_mode else '#3388ff'
-            fill_color = '#19647E' if self.dark_mode else '#3388ff'
-            dash_array = None
-            weight = 2
-
-            GeoJson(
-                place['boundaries'],
-                style_function=lambda x: {
-                    'fillColor': fill_color,
-                    'color': color,
-                    'weight': weight,
-                    'fillOpacity': 0.4,
-                    'dashArray': dash_array
-                }
-            ).add_to(self.map)
-
-    def add_all_places(self, places):
-        """Add all places to the map"""
-        self.reset()
-        for place in places:
-            self.add_place(place)
-
-    def to_html(self):
-        """Convert map to HTML for display"""
-        import io
-        data = io.BytesIO()
-        self.map.save(data, close_file=False)
-        return data.getvalue().decode()
+    def iter_places(self):
+        """Stream every stored place with its boundaries, one at a time, e.g. for export."""
+        return self.store.iter_places()
+
+    def place_exists(self, name):
+        """Check if a place with the same name already exists (case-insensitive)."""
+        return name in self.places
+
+    def get_places_by_year(self, year):
+        """Get the places visited in a year."""
+        return self.places.with_year(year)
+
+    def get_places_by_source(self, source):
+        """Get the places whose boundary came from a source."""
+        return self.places.with_source(source)
+
+    def catalogue_version(self):
+        """Changes whenever a place is added, updated or removed."""
+        return self.store.catalogue_version()
+
+    def complete_name(self, prefix, limit=10):
+        """Suggest boundary names from the loaded local layers that start with prefix."""
+        suggestions = []
+        for index in self.boundary_indexes.loaded().values():
+            if index.names is None:
+                continue
+            for name in index.names.complete(prefix, limit):
+                if name not in suggestions:
+                    suggestions.append(name)
+            if len(suggestions) >= limit:
+                break
+        return suggestions[:limit]
 
 class TravelMapApp(QMainWindow):
     """Main application window"""
@@ -368,11 +498,27 @@ class TravelMapApp(QMainWindow):
         self.setGeometry(100, 100, 1200, 700)
         self.dark_mode = False
         self.data_manager = PlaceDataManager()
-        self.travel_map = TravelMap(dark_mode=self.dark_mode)
+        self.tile_server = None
+        if len(self.data_manager.get_all_places()) > TILE_MODE_THRESHOLD:
+            # Too many places to inline in the page; serve them as tiles instead
+            self.tile_server = TileServer(PlaceTileIndex()).start()
+        self.travel_map = TravelMap(dark_mode=self.dark_mode, markers=False, lazy_detail=True,
+                                    tile_server=self.tile_server)
         self.temp_dir = tempfile.TemporaryDirectory()
         self.temp_map_path = os.path.join(self.temp_dir.name, "temp_map.html")
+        self.render_cache = RenderCache()
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(4)
+        self.pending_places = set()
+        self.map_ready = False
+        self.pending_scripts = []
         self.init_ui()
         self.load_places_and_update_map()
+        # Import the geo stack, then load the GeoPackage layers, in the background;
+        # the window does not wait for them. Every lookup checks all layers, and
+        # name completion only searches the loaded ones, so they are needed early
+        preload_in_background(GEO_MODULES + ("geopandas", "pycountry"),
+                              then=self.data_manager.boundary_indexes.preload)
 
     def init_ui(self):
         """Initialize the user interface"""
@@ -406,6 +552,12 @@ class TravelMapApp(QMainWindow):
         self.place_input = QLineEdit()
         self.place_input.setPlaceholderText("City, Country")
         self.place_input.returnPressed.connect(self.add_place)
+        self.completion_model = QStringListModel()
+        completer = QCompleter(self.completion_model, self)
+        completer.setCaseSensitivity(Qt.CaseInsensitive)
+        completer.setFilterMode(Qt.MatchContains)
+        self.place_input.setCompleter(completer)
+        self.place_input.textEdited.connect(self.update_completions)
         sidebar_layout.addWidget(self.place_input)
 
         sidebar_layout.addWidget(QLabel("Year of Visit (optional):"))
@@ -446,11 +598,22 @@ class TravelMapApp(QMainWindow):
         self.theme_button.clicked.connect(self.toggle_theme)
         sidebar_layout.addWidget(self.theme_button)
 
+        self.diagnostics_button = QPushButton("Diagnostics")
+        self.diagnostics_button.setMinimumHeight(30)
+        self.diagnostics_button.clicked.connect(self.show_diagnostics)
+        sidebar_layout.addWidget(self.diagnostics_button)
+
         splitter.addWidget(sidebar)
         map_container = QWidget()
         map_layout = QVBoxLayout(map_container)
         map_layout.setContentsMargins(0, 0, 0, 0)
         self.map_view = QWebEngineView()
+        self.map_view.loadFinished.connect(self.map_loaded)
+        # Full-resolution boundaries are fetched by the page when zoomed in
+        self.map_bridge = MapBridge(lambda key: self.travel_map.boundaries_json(key), self)
+        self.map_channel = QWebChannel(self.map_view.page())
+        self.map_channel.registerObject("mapBridge", self.map_bridge)
+        self.map_view.page().setWebChannel(self.map_channel)
         map_layout.addWidget(self.map_view)
         splitter.addWidget(map_container)
         splitter.setSizes([300, 900])
@@ -478,45 +641,100 @@ class TravelMapApp(QMainWindow):
         self.update_map_view()
 
     def update_map_view(self):
-        """Update the map in the WebEngineView"""
-        html = self.travel_map.to_html()
+        """Reload the whole map in the WebEngineView"""
+        # The new page already contains every place, so queued scripts are dropped
+        self.map_ready = False
+        self.pending_scripts = []
+        # Toggling back to a theme, or restarting with an unchanged catalogue, reuses the page
+        key = (self.data_manager.catalogue_version(),) + self.travel_map.render_key()
+        html = self.travel_map.finish_page(self.render_cache.get_or_render(key, self.travel_map.cacheable_html))
         with open(self.temp_map_path, "w", encoding="utf-8") as f:
             f.write(html)
         self.map_view.load(QUrl.fromLocalFile(os.path.abspath(self.temp_map_path)))
 
+    def map_loaded(self, ok):
+        """Run the map updates that arrived while the page was loading"""
+        self.map_ready = ok
+        if ok:
+            for script in self.pending_scripts:
+                self.map_view.page().runJavaScript(script)
+            self.pending_scripts = []
+
+    def run_map_script(self, script):
+        """Update the loaded map page in place, keeping pan and zoom"""
+        if self.map_ready:
+            self.map_view.page().runJavaScript(script)
+        else:
+            self.pending_scripts.append(script)
+
     def add_place(self):
-        """Add a new place to the database and map"""
-        try:
-            place_name = self.place_input.text().strip().upper()
-            if not place_name:
-                QMessageBox.warning(self, "Input Error", "Place name cannot be empty.")
+        """Queue a new place for lookup on the worker pool"""
+        place_name = self.place_input.text().strip().upper()
+        if not place_name:
+            QMessageBox.warning(self, "Input Error", "Place name cannot be empty.")
+            return
+        if normalize_name(place_name) in self.pending_places:
+            QMessageBox.warning(self, "Input Error", f"{place_name} is already being added.")
+            return
+        if self.data_manager.place_exists(place_name):
+            QMessageBox.warning(self, "Input Error", f"{place_name} is already added.")
+            return
+
+        year_text = self.year_input.text().strip()
+        year = None
+        if year_text:
+            try:
+                year = int(year_text)
+            except ValueError:
+                QMessageBox.warning(self, "Input Error", "Year must be a valid number.")
                 return
 
-            year_text = self.year_input.text().strip()
-            year = None
-            if year_text:
-                try:
-                    year = int(year_text)
-                except ValueError:
-                    QMessageBox.warning(self, "Input Error", "Year must be a valid number.")
-                    return
-
-            self.statusBar().showMessage("Locating place... This may take a moment.")
-            QApplication.processEvents()
+        # The lookup can take tens of seconds, so it runs off the GUI thread
+        self.pending_places.add(normalize_name(place_name))
+        worker = ResolvePlaceWorker(place_name, self.data_manager.resolve_place, year)
+        worker.signals.progress.connect(self.place_progress)
+        worker.signals.finished.connect(self.place_resolved)
+        worker.signals.failed.connect(self.place_failed)
+        self.thread_pool.start(worker)
+
+        self.place_input.clear()
+        self.year_input.clear()
+        self.show_pending_status()
+
+    def place_progress(self, place_name, message):
+        """Show progress reported by a worker"""
+        self.statusBar().showMessage(message)
+
+    def place_resolved(self, place_name, place):
+        """Store a place resolved by a worker and show it on the map"""
+        self.pending_places.discard(normalize_name(place_name))
+        try:
+            self.data_manager.store_place(place)
+        except Exception as e:
+            self.show_pending_status()
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        self.travel_map.add_place(place)
+        self.run_map_script(self.travel_map.add_place_script(place))
+        self.load_places_list()
+        timing = tracer.breakdown('resolve_place', place=place_name)
+        self.show_pending_status(f"Added {place_name} in {timing}." if timing else f"Added {place_name} successfully!")
 
-            place = self.data_manager.add_place(place_name, year)
-            self.travel_map.add_place(place)
-            self.update_map_view()
+    def place_failed(self, place_name, error):
+        """Report a place that could not be resolved"""
+        self.pending_places.discard(normalize_name(place_name))
+        self.show_pending_status()
+        QMessageBox.critical(self, "Error", error)
 
-            self.place_input.clear()
-            self.year_input.clear()
-            self.load_places_list()
-            self.stats_label.setText(f"Total Places: {len(self.data_manager.get_all_places())}")
-            self.statusBar().showMessage(f"Added {place_name} successfully!", 3000)
+    def show_pending_status(self, message=""):
+        """Show a status message plus the number of lookups still running"""
+        if self.pending_places:
+            message = f"{message} Looking up {len(self.pending_places)} place(s)...".strip()
+        self.statusBar().showMessage(message, 0 if self.pending_places else 3000)
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
-            self.statusBar().clearMessage()
+    def show_diagnostics(self):
+        """Show span timings and cache counters"""
+        DiagnosticsDialog(tracer, self).exec_()
 
     def remove_place(self):
         """Remove a selected place"""
@@ -538,13 +756,22 @@ class TravelMapApp(QMainWindow):
             if reply == QMessageBox.Yes:
                 success = self.data_manager.remove_place(place_name)
                 if success:
-                    self.load_places_and_update_map()
+                    self.travel_map.remove_place(place_name)
+                    self.run_map_script(self.travel_map.remove_place_script(place_name))
+                    self.load_places_list()
                     self.statusBar().showMessage(f"{display_text} removed successfully.", 3000)
                 else:
                     QMessageBox.warning(self, "Error", f"{display_text} not found.")
         else:
             QMessageBox.warning(self, "Selection Error", "Please select a place to remove.")
 
+    def update_completions(self, text):
+        """Refresh place name suggestions from the boundary name indexes"""
+        if ',' in text or len(text.strip()) < 2:
+            self.completion_model.setStringList([])
+            return
+        self.completion_model.setStringList(self.data_manager.complete_name(text.strip()))
+
     def place_selected(self, item):
         """Handle place selection in list"""
         self.statusBar().showMessage(f"Selected: {item.text()}", 2000)
@@ -557,13 +784,17 @@ class TravelMapApp(QMainWindow):
             StyleManager.apply_dark_theme(app)
         else:
             StyleManager.apply_light_theme(app)
-        self.travel_map = TravelMap(dark_mode=self.dark_mode)
+        self.travel_map = TravelMap(dark_mode=self.dark_mode, markers=False, lazy_detail=True,
+                                    tile_server=self.tile_server)
         self.load_places_and_update_map()
         theme_name = "Dark" if self.dark_mode else "Light"
         self.statusBar().showMessage(f"Switched to {theme_name} theme", 3000)
 
     def closeEvent(self, event):
         """Clean up temporary files on exit"""
+        self.thread_pool.clear()
+        if self.tile_server:
+            self.tile_server.stop()
         try:
             self.temp_dir.cleanup()
         except:
@@ -0,0 +1,144 @@
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from geometry_codec import encode_geometry, decode_geometry
+from place_store import normalize_name
+from tracing import tracer
+
+_MISSING = object()
+
+
+class OSMBoundaryCache:
+    """Persistent cache of resolved OSM administrative boundaries
+
+    Stores the boundary chosen for each normalised place name (or the fact
+    that Overpass returned no usable polygon), so re-adding a place or
+    rebuilding the catalogue does not query Overpass again. Failed queries
+    are not cached.
+    """
+
+    def __init__(self, db_file="osm_boundary_cache.sqlite"):
+        self.db_file = db_file
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS osm_boundaries (
+                    name_key TEXT PRIMARY KEY,
+                    query TEXT NOT NULL,
+                    osm_name TEXT,
+                    score INTEGER,
+                    geometry BLOB,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, name, default=None):
+        """Return the cached result for a place (None if OSM had no boundary), or default."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT osm_name, score, geometry FROM osm_boundaries WHERE name_key = ?", (normalize_name(name),)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            tracer.count('osm_cache.miss')
+            return default
+        self.hits += 1
+        tracer.count('osm_cache.hit')
+        osm_name, score, geometry = row
+        if geometry is None:
+            return None
+        return {'name': osm_name, 'score': score, 'geometry': decode_geometry(geometry)}
+
+    def put(self, name, query, result):
+        """Store the boundary chosen for a place; result may be None for 'no boundary'."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO osm_boundaries VALUES (?, ?, ?, ?, ?, ?)",
+                (normalize_name(name), query,
+                 result['name'] if result else None,
+                 result.get('score') if result else None,
+                 encode_geometry(result['geometry']) if result else None,
+                 time.time())
+            )
+
+    def lookup(self, name, query, fetch):
+        """Return the cached result for a place, calling fetch() and caching it on a miss."""
+        cached = self.get(name, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        result = fetch()
+        self.put(name, query, result)
+        return result
+
+    def entries(self):
+        """List cached entries (without geometry) for inspection."""
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT name_key, query, osm_name, score, LENGTH(geometry), fetched_at
+                FROM osm_boundaries ORDER BY fetched_at
+            """).fetchall()
+        return [
+            {'name': name_key, 'query': query, 'osm_name': osm_name, 'score': score,
+             'geometry_bytes': size or 0, 'fetched_at': fetched_at}
+            for name_key, query, osm_name, score, size, fetched_at in rows
+        ]
+
+    def prune(self, older_than=None, names=None, empty_only=False):
+        """Delete entries older than `older_than` seconds, for the given names, or all.
+
+        With empty_only, only 'no boundary' results are removed so they are retried.
+        Returns the number of deleted entries.
+        """
+        clauses, params = [], []
+        if older_than is not None:
+            clauses.append("fetched_at < ?")
+            params.append(time.time() - older_than)
+        if names:
+            keys = [normalize_name(name) for name in names]
+            clauses.append(f"name_key IN ({', '.join('?' * len(keys))})")
+            params.extend(keys)
+        if empty_only:
+            clauses.append("geometry IS NULL")
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock, self.conn:
+            cursor = self.conn.execute(f"DELETE FROM osm_boundaries{where}", params)
+        return cursor.rowcount
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or prune the cached OSM boundaries.")
+    parser.add_argument("--db", default="osm_boundary_cache.sqlite", help="Cache database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List cached places")
+    prune = commands.add_parser("prune", help="Delete cached entries")
+    prune.add_argument("names", nargs="*", help="Only prune these places")
+    prune.add_argument("--older-than", type=float, metavar="DAYS", help="Only prune entries older than this")
+    prune.add_argument("--empty", action="store_true", help="Only prune places where OSM had no boundary")
+    args = parser.parse_args(argv)
+
+    cache = OSMBoundaryCache(args.db)
+    if args.command == "list":
+        for entry in cache.entries():
+            fetched = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry['fetched_at']))
+            found = f"{entry['osm_name']} ({entry['geometry_bytes']} bytes)" if entry['geometry_bytes'] else "no boundary"
+            print(f"{entry['name']:<30} {fetched}  {found}")
+    else:
+        older_than = args.older_than * 24 * 3600 if args.older_than is not None else None
+        count = cache.prune(older_than=older_than, names=args.names, empty_only=args.empty)
+        print(f"Pruned {count} entries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+from place_store import normalize_name
+
+
+class PlaceIndex:
+    """In-memory catalogue with constant-time lookups
+
+    Places are kept in insertion order keyed by normalised name, with
+    secondary indexes on 'year' and 'boundary_source'. Changes must go through
+    add() and remove(); after editing a stored place's year or source, add()
+    it again to re-index it (it keeps its position).
+    """
+
+    SECONDARY_FIELDS = ('year', 'boundary_source')
+
+    def __init__(self, places=()):
+        self.by_name = {}
+        self.secondary = {field: {} for field in self.SECONDARY_FIELDS}
+        self.indexed_values = {}
+        for place in places:
+            self.add(place)
+
+    def __len__(self):
+        return len(self.by_name)
+
+    def __iter__(self):
+        return iter(self.by_name.values())
+
+    def __contains__(self, name):
+        return normalize_name(name) in self.by_name
+
+    def get(self, name, default=None):
+        """Return the place with this name (case-insensitive), or default."""
+        return self.by_name.get(normalize_name(name), default)
+
+    def add(self, place):
+        """Add a place, replacing (and re-indexing) any place with the same name."""
+        key = normalize_name(place['name'])
+        self._unindex(key)
+        self.by_name[key] = place
+        values = tuple(place.get(field) for field in self.SECONDARY_FIELDS)
+        for field, value in zip(self.SECONDARY_FIELDS, values):
+            if value is not None:
+                self.secondary[field].setdefault(value, {})[key] = place
+        self.indexed_values[key] = values
+
+    def remove(self, name):
+        """Remove a place by name, returning it (or None if it was not there)."""
+        key = normalize_name(name)
+        self._unindex(key)
+        return self.by_name.pop(key, None)
+
+    def _unindex(self, key):
+        values = self.indexed_values.pop(key, None)
+        if values is None:
+            return
+        for field, value in zip(self.SECONDARY_FIELDS, values):
+            group = self.secondary[field].get(value)
+            if group is not None:
+                group.pop(key, None)
+                if not group:
+                    del self.secondary[field][value]
+
+    def with_year(self, year):
+        """Return the places visited in a year."""
+        return list(self.secondary['year'].get(year, {}).values())
+
+    def with_source(self, source):
+        """Return the places whose boundary came from a source."""
+        return list(self.secondary['boundary_source'].get(source, {}).values())
+
+    def years(self):
+        return sorted(self.secondary['year'])
+
+    def sources(self):
+        return sorted(self.secondary['boundary_source'])
+
+    def clear(self):
+        self.by_name.clear()
+        self.indexed_values.clear()
+        for groups in self.secondary.values():
+            groups.clear()
@@ -0,0 +1,369 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from geometry_codec import encode_geometry, decode_geometry, is_encoded_geometry
+from geometry_lod import build_lods, geometry_bbox
+from tracing import tracer
+
+# Keys kept out of the metadata rows and read from the store on demand
+GEOMETRY_KEYS = ('boundaries', 'lods')
+
+
+def normalize_name(name):
+    """Normalise a place name for case-insensitive lookups."""
+    return " ".join(name.split()).lower()
+
+
+class LazyPlace(dict):
+    """Place metadata whose geometry ('boundaries', 'lods') is read from the store on first access"""
+
+    def __init__(self, data, loaders):
+        super().__init__(data)
+        self._loaders = loaders
+
+    def __missing__(self, key):
+        if key not in self._loaders:
+            raise KeyError(key)
+        value = self._loaders[key](self['name'])
+        self[key] = value
+        return value
+
+    def get(self, key, default=None):
+        if key in self._loaders:
+            return self[key]
+        return super().get(key, default)
+
+    def boundaries_loaded(self):
+        """Check whether the geometry has been read from the store yet."""
+        return dict.__contains__(self, 'boundaries')
+
+
+class PlaceStore:
+    """SQLite-backed place storage that writes only the changed record
+
+    Place metadata (name, lat, lon, year, boundary_source, ...) and boundary
+    geometry live in separate tables so the catalogue can be listed without
+    parsing any polygon coordinates.
+
+    geometry_format selects how boundaries are written: "json" stores GeoJSON
+    text, "packed" stores the binary encoding from geometry_codec (lossless
+    float64, or rounded to `precision` decimal places when given). Both
+    formats can be read regardless of the current setting.
+    """
+
+    SCHEMA_VERSION = 3
+
+    def __init__(self, db_file="places_db.sqlite", geometry_format="json", precision=None):
+        if geometry_format not in ("json", "packed"):
+            raise ValueError(f"Unknown geometry format: {geometry_format}")
+        self.db_file = db_file
+        self.geometry_format = geometry_format
+        self.precision = precision
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA mmap_size=268435456")
+        self._create_tables()
+        self._upgrade_schema()
+        if self.get_meta('catalogue_id') is None:
+            self.set_meta('catalogue_id', uuid.uuid4().hex)
+
+    def _create_tables(self):
+        """Create the tables used by the store if they do not exist yet."""
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS places (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name_key TEXT NOT NULL UNIQUE,
+                    data TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS geometries (
+                    name_key TEXT PRIMARY KEY,
+                    data TEXT
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS geometry_lods (
+                    name_key TEXT NOT NULL,
+                    min_zoom INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (name_key, min_zoom)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+    def _upgrade_schema(self):
+        """Bring metadata rows written by older versions up to date.
+
+        Version 2 moved geometry out of the metadata rows; version 3 adds each
+        place's bbox to its metadata.
+        """
+        version = int(self.get_meta('schema_version', 0))
+        if version >= self.SCHEMA_VERSION:
+            return
+        with self.lock, self.conn:
+            rows = self.conn.execute("SELECT name_key, data FROM places").fetchall()
+            for name_key, data in rows:
+                place = json.loads(data)
+                if 'boundaries' in place:
+                    boundaries = place.pop('boundaries')
+                    self._put_geometry(name_key, boundaries)
+                else:
+                    row = self.conn.execute("SELECT data FROM geometries WHERE name_key = ?", (name_key,)).fetchone()
+                    boundaries = self._decode_geometry(row[0]) if row and row[0] is not None else None
+                bbox = geometry_bbox(boundaries) if boundaries else None
+                if bbox is not None:
+                    place['bbox'] = list(bbox)
+                self.conn.execute("UPDATE places SET data = ? WHERE name_key = ?", (json.dumps(place), name_key))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                ('schema_version', str(self.SCHEMA_VERSION))
+            )
+
+    def get_meta(self, key, default=None):
+        """Read a value from the meta table."""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        """Write a value to the meta table."""
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def catalogue_version(self):
+        """Identify the current catalogue contents, e.g. for caching rendered maps.
+
+        Returns "<catalogue id>:<write counter>"; the counter goes up with
+        every change to the stored places.
+        """
+        return f"{self.get_meta('catalogue_id')}:{self.get_meta('catalogue_version', 0)}"
+
+    def _bump_version(self):
+        self.conn.execute("""
+            INSERT INTO meta (key, value) VALUES ('catalogue_version', '1')
+            ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        """)
+
+    def count(self):
+        """Return the number of stored places."""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+
+    def load_all(self):
+        """Load the metadata of every place in insertion order.
+
+        Boundaries are not read here; each returned place fetches its own
+        geometry the first time place['boundaries'] or place['lods'] is accessed.
+        """
+        with tracer.span('store.load_all') as span:
+            with self.lock:
+                rows = self.conn.execute("SELECT data FROM places ORDER BY id").fetchall()
+            loaders = {'boundaries': self.load_boundaries, 'lods': self.load_lods}
+            span['places'] = len(rows)
+            return [LazyPlace(json.loads(row[0]), loaders) for row in rows]
+
+    def iter_places(self, batch_size=100):
+        """Yield every place with its boundaries, one at a time, in insertion order.
+
+        Rows are read `batch_size` at a time and the lock is only held while
+        a batch is read, so memory stays flat for any catalogue size and
+        writers are not blocked for the whole iteration. Simplified variants
+        ('lods') are not included.
+        """
+        last_id = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute("""
+                    SELECT places.id, places.data, geometries.data FROM places
+                    LEFT JOIN geometries ON geometries.name_key = places.name_key
+                    WHERE places.id > ? ORDER BY places.id LIMIT ?
+                """, (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            for row_id, data, geometry in rows:
+                place = json.loads(data)
+                place['boundaries'] = self._decode_geometry(geometry) if geometry is not None else None
+                yield place
+            last_id = rows[-1][0]
+
+    def load_boundaries(self, name):
+        """Load the boundary geometry of a single place, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data FROM geometries WHERE name_key = ?", (normalize_name(name),)
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return self._decode_geometry(row[0])
+
+    def load_lods(self, name):
+        """Load the simplified map variants of a place as [min_zoom, geometry] pairs.
+
+        Places stored before variants were precomputed get them built from
+        their boundary now and written back, so that only happens once.
+        """
+        name_key = normalize_name(name)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT min_zoom, data FROM geometry_lods WHERE name_key = ? ORDER BY min_zoom", (name_key,)
+            ).fetchall()
+        if rows:
+            return [[min_zoom, self._decode_geometry(data)] for min_zoom, data in rows]
+        # Read through the store rather than the place, so a LazyPlace does not keep the full boundary
+        lods = build_lods(self.load_boundaries(name))
+        if lods:
+            with tracer.span('store.backfill_lods', place=name), self.lock, self.conn:
+                # Skip places removed meanwhile; LODs are derived data, so the catalogue version stays
+                if self.conn.execute("SELECT 1 FROM places WHERE name_key = ?", (name_key,)).fetchone():
+                    self._put_lods(name_key, lods)
+        return lods
+
+    def put(self, place):
+        """Insert or replace a single place."""
+        with tracer.span('store.put', places=1) as span, self.lock, self.conn:
+            span['bytes'] = self._put(place)
+            self._bump_version()
+        tracer.count('store.bytes_written', span['bytes'])
+
+    def put_many(self, places):
+        """Insert or replace several places in a single transaction."""
+        with tracer.span('store.put_many') as span, self.lock, self.conn:
+            span['places'] = span['bytes'] = 0
+            for place in places:
+                span['bytes'] += self._put(place)
+                span['places'] += 1
+            self._bump_version()
+        tracer.count('store.bytes_written', span['bytes'])
+
+    def _put(self, place):
+        """Write one place, returning the number of bytes of data written."""
+        name_key = normalize_name(place['name'])
+        if dict.__contains__(place, 'boundaries'):
+            # Kept in the metadata so places can be located without reading geometry
+            bbox = geometry_bbox(place['boundaries']) if place['boundaries'] else None
+            if bbox is not None:
+                place['bbox'] = list(bbox)
+            else:
+                place.pop('bbox', None)
+        metadata = json.dumps({k: v for k, v in dict.items(place) if k not in GEOMETRY_KEYS})
+        # An upsert keeps the row id, which orders the catalogue and pages iter_places
+        self.conn.execute(
+            "INSERT INTO places (name_key, data) VALUES (?, ?) "
+            "ON CONFLICT(name_key) DO UPDATE SET data = excluded.data",
+            (name_key, metadata)
+        )
+        written = len(metadata)
+        # A LazyPlace whose geometry was never loaded still has it stored
+        if dict.__contains__(place, 'boundaries'):
+            written += self._put_geometry(name_key, place['boundaries'])
+        if dict.__contains__(place, 'lods') and place['lods'] is not None:
+            written += self._put_lods(name_key, place['lods'])
+        return written
+
+    def _put_lods(self, name_key, lods):
+        rows = [(name_key, min_zoom, self._encode_geometry(geometry)) for min_zoom, geometry in lods]
+        self.conn.execute("DELETE FROM geometry_lods WHERE name_key = ?", (name_key,))
+        self.conn.executemany("INSERT INTO geometry_lods (name_key, min_zoom, data) VALUES (?, ?, ?)", rows)
+        return sum(len(data) for _, _, data in rows)
+
+    def _put_geometry(self, name_key, boundaries):
+        data = None if boundaries is None else self._encode_geometry(boundaries)
+        self.conn.execute("INSERT OR REPLACE INTO geometries (name_key, data) VALUES (?, ?)", (name_key, data))
+        return len(data) if data is not None else 0
+
+    def _encode_geometry(self, boundaries):
+        if self.geometry_format == "packed":
+            return encode_geometry(boundaries, self.precision)
+        return json.dumps(boundaries)
+
+    def _decode_geometry(self, data):
+        if is_encoded_geometry(data):
+            return decode_geometry(data)
+        return json.loads(data)
+
+    def repack(self):
+        """Re-encode every stored geometry in the current geometry format."""
+        with self.lock, self.conn:
+            rows = self.conn.execute("SELECT name_key, data FROM geometries WHERE data IS NOT NULL").fetchall()
+            for name_key, data in rows:
+                self._put_geometry(name_key, self._decode_geometry(data))
+            lod_rows = self.conn.execute("SELECT name_key, min_zoom, data FROM geometry_lods").fetchall()
+            for name_key, min_zoom, data in lod_rows:
+                self.conn.execute(
+                    "UPDATE geometry_lods SET data = ? WHERE name_key = ? AND min_zoom = ?",
+                    (self._encode_geometry(self._decode_geometry(data)), name_key, min_zoom)
+                )
+        return len(rows)
+
+    def delete(self, name):
+        """Delete a single place by name, returning True if it existed."""
+        name_key = normalize_name(name)
+        with self.lock, self.conn:
+            cursor = self.conn.execute("DELETE FROM places WHERE name_key = ?", (name_key,))
+            self.conn.execute("DELETE FROM geometries WHERE name_key = ?", (name_key,))
+            self.conn.execute("DELETE FROM geometry_lods WHERE name_key = ?", (name_key,))
+            if cursor.rowcount:
+                self._bump_version()
+        return cursor.rowcount > 0
+
+    def replace_all(self, places):
+        """Replace the whole catalogue in a single transaction."""
+        with tracer.span('store.replace_all') as span, self.lock, self.conn:
+            self.conn.execute("DELETE FROM places")
+            span['places'] = span['bytes'] = 0
+            for place in places:
+                span['bytes'] += self._put(place)
+                span['places'] += 1
+            self.conn.execute("DELETE FROM geometries WHERE name_key NOT IN (SELECT name_key FROM places)")
+            self.conn.execute("DELETE FROM geometry_lods WHERE name_key NOT IN (SELECT name_key FROM places)")
+            self._bump_version()
+        tracer.count('store.bytes_written', span['bytes'])
+
+    def migrate_from_json(self, json_file):
+        """One-shot import of a legacy places_db.json file.
+
+        The import only runs while the store is empty and has never been
+        migrated, so the JSON file is left untouched and can be kept as a backup.
+        """
+        if self.get_meta('migrated_from') or self.count() or not os.path.exists(json_file):
+            return 0
+        try:
+            with open(json_file, "r", encoding="utf-8") as f:
+                places = json.load(f)
+        except json.JSONDecodeError:
+            print(f"Error decoding JSON from {json_file}")
+            return 0
+        with tracer.span('store.migrate', places=len(places)), self.lock, self.conn:
+            for place in places:
+                if place.get('lods') is None:
+                    # The JSON file predates LODs; build them once here rather than on every render
+                    place['lods'] = build_lods(place.get('boundaries'))
+                self._put(place)
+            self._bump_version()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                ('migrated_from', os.path.abspath(json_file))
+            )
+        print(f"Migrated {len(places)} places from {json_file} to {self.db_file}")
+        return len(places)
+
+    def compact(self):
+        """Reclaim space left behind by removed places."""
+        with self.lock:
+            self.conn.execute("VACUUM")
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,36 @@
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot
+
+
+class WorkerSignals(QObject):
+    """Signals emitted by a ResolvePlaceWorker (delivered on the GUI thread)"""
+
+    progress = pyqtSignal(str, str)  # place name, status message
+    finished = pyqtSignal(str, object)  # place name, resolved place dict
+    failed = pyqtSignal(str, str)  # place name, error message
+
+
+class ResolvePlaceWorker(QRunnable):
+    """Runs the slow geocoding/boundary lookup for one place on a QThreadPool
+
+    `resolve` is called as resolve(name, *args, progress=callback) and must not
+    touch any Qt widgets; the result is handed back through the signals.
+    """
+
+    def __init__(self, name, resolve, *args):
+        super().__init__()
+        self.name = name
+        self.resolve = resolve
+        self.args = args
+        self.signals = WorkerSignals()
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            place = self.resolve(self.name, *self.args, progress=self.report_progress)
+        except Exception as e:
+            self.signals.failed.emit(self.name, str(e))
+        else:
+            self.signals.finished.emit(self.name, place)
+
+    def report_progress(self, message):
+        self.signals.progress.emit(self.name, message)
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from tracing import tracer
+
+
+class RenderCache:
+    """Cache of generated map pages keyed by catalogue version and map settings
+
+    The most recently used pages are kept in memory (up to `max_entries`).
+    Every page is also written to `cache_dir` so it survives restarts; the
+    directory is trimmed to `max_disk_bytes`, oldest files first. Keys can be
+    any value with a stable repr(), e.g. a tuple of the catalogue version and
+    TravelMap.render_key().
+
+    Safe to share between threads: concurrent requests for the same missing
+    page render it once, and the others wait for that result.
+    """
+
+    def __init__(self, cache_dir="render_cache", max_entries=4, max_disk_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.render_locks = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.html")
+
+    def get(self, key):
+        """Return the cached page for key, or None."""
+        with self.lock:
+            html = self.memory.get(key)
+            if html is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                tracer.count('render_cache.hit')
+                return html
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                html = f.read()
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            tracer.count('render_cache.miss')
+            return None
+        os.utime(path)
+        with self.lock:
+            self.hits += 1
+            self._remember(key, html)
+        tracer.count('render_cache.hit')
+        return html
+
+    def put(self, key, html):
+        """Store a page in memory and on disk."""
+        with self.lock:
+            self._remember(key, html)
+        path = self.path(key)
+        # A temp file per writer, so concurrent puts of one key cannot replace each other's
+        fd, temp_file = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                f.write(html)
+            os.replace(temp_file, path)
+        except BaseException:
+            os.remove(temp_file)
+            raise
+        self._trim_disk()
+
+    def get_or_render(self, key, render):
+        """Return the cached page for key, calling render() and caching it on a miss."""
+        with self.lock:
+            render_lock, waiters = self.render_locks.get(key, (threading.Lock(), 0))
+            self.render_locks[key] = (render_lock, waiters + 1)
+        try:
+            with render_lock:
+                html = self.get(key)
+                if html is None:
+                    with tracer.span('render_page'):
+                        html = render()
+                    self.put(key, html)
+            return html
+        finally:
+            with self.lock:
+                render_lock, waiters = self.render_locks[key]
+                if waiters == 1:
+                    del self.render_locks[key]
+                else:
+                    self.render_locks[key] = (render_lock, waiters - 1)
+
+    def _remember(self, key, html):
+        self.memory[key] = html
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _trim_disk(self):
+        files = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".html"):
+                path = os.path.join(self.cache_dir, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # Trimmed by another thread meanwhile
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".html"):
+                os.remove(os.path.join(self.cache_dir, file_name))
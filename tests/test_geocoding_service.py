@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Modules under test live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geocoding_service import GeocodingService
+
+try:
+    import geopy
+except ImportError:
+    geopy = None
+
+
+class StubNominatim(BaseHTTPRequestHandler):
+    """Answers /search like Nominatim, recording when each query arrived
+
+    The first request for a query listed in `rate_limited` gets a 429 with a
+    Retry-After header instead.
+    """
+
+    def do_GET(self):
+        server = self.server
+        query = parse_qs(urlsplit(self.path).query).get('q', [''])[0]
+        with server.lock:
+            server.requests.append((time.monotonic(), query))
+            limited = query in server.rate_limited
+            server.rate_limited.discard(query)
+        time.sleep(server.delay)
+        if limited:
+            self.send_response(429)
+            self.send_header("Retry-After", str(server.retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps([{'lat': "48.85", 'lon': "2.35", 'display_name': query}]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@unittest.skipIf(geopy is None, "geopy is not installed")
+class GeocodingServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubNominatim)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.rate_limited = set()
+        self.server.retry_after = 1
+        self.server.delay = 0.0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def service(self, **options):
+        service = GeocodingService(domain=f"127.0.0.1:{self.server.server_address[1]}", scheme="http",
+                                   backoff=0.01, **options)
+        self.addCleanup(service.shutdown)
+        return service
+
+    def test_requests_are_spaced_by_the_token_bucket(self):
+        service = self.service(rate=5.0, burst=1)
+        results = service.geocode_many(["Paris", "Lyon", "Nice", "Lille"])
+        self.assertTrue(all(location is not None and not isinstance(location, Exception)
+                            for location in results.values()))
+        times = sorted(arrived for arrived, _ in self.server.requests)
+        self.assertEqual(len(times), 4)
+        for earlier, later in zip(times, times[1:]):
+            self.assertGreaterEqual(later - earlier, 0.18)
+
+    def test_identical_queries_in_flight_are_coalesced(self):
+        self.server.delay = 0.3
+        service = self.service(rate=100.0)
+        first = service.submit("Paris, France")
+        second = service.submit("  paris,  FRANCE ")
+        self.assertIs(first, second)
+        self.assertEqual(first.result().address, "Paris, France")
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(service.requests_made, 1)
+
+    def test_rate_limited_request_is_retried_after_retry_after(self):
+        self.server.rate_limited.add("Paris")
+        service = self.service(rate=100.0)
+        location = service.geocode("Paris")
+        self.assertEqual(location.address, "Paris")
+        (limited, _), (retried, _) = self.server.requests
+        self.assertGreaterEqual(retried - limited, self.server.retry_after - 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
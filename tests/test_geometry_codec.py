@@ -0,0 +1,119 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+# Modules under test live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geometry_codec import decode_geometry, encode_geometry, is_encoded_geometry
+from place_store import PlaceStore
+
+
+def ring(lon, lat, size, points=50, seed=0):
+    rng = random.Random(seed)
+    coordinates = [[lon + rng.uniform(0, size), lat + rng.uniform(0, size)] for _ in range(points)]
+    return coordinates + [coordinates[0]]
+
+
+POLYGON = {'type': 'Polygon', 'coordinates': [ring(2.2945, 48.8584, 0.1), ring(2.31, 48.87, 0.01, 8, seed=1)]}
+GEOMETRIES = {
+    'Point': {'type': 'Point', 'coordinates': [-122.419416, 37.774929]},
+    'Point 3D': {'type': 'Point', 'coordinates': [-122.419416, 37.774929, 16.25]},
+    'Polygon': POLYGON,
+    'MultiPolygon': {'type': 'MultiPolygon', 'coordinates': [
+        POLYGON['coordinates'], [ring(-179.99, -89.5, 0.005, seed=2)], [ring(179.9, 89.9, 0.09, seed=3)]
+    ]},
+    'GeometryCollection': {'type': 'GeometryCollection', 'geometries': [
+        {'type': 'Point', 'coordinates': [0.0, 0.0]},
+        {'type': 'LineString', 'coordinates': ring(10.0, 50.0, 1.0, 5, seed=4)},
+        {'type': 'GeometryCollection', 'geometries': [POLYGON]},
+    ]},
+    'empty Point': {'type': 'Point', 'coordinates': []},
+    'empty Polygon': {'type': 'Polygon', 'coordinates': []},
+    'empty MultiPolygon': {'type': 'MultiPolygon', 'coordinates': []},
+    'Polygon with an empty ring': {'type': 'Polygon', 'coordinates': [[]]},
+    'empty GeometryCollection': {'type': 'GeometryCollection', 'geometries': []},
+}
+
+
+def positions(geometry):
+    """Every position of a geometry, in order."""
+    if geometry['type'] == 'GeometryCollection':
+        return [position for member in geometry['geometries'] for position in positions(member)]
+    found = []
+    stack = [geometry['coordinates']]
+    while stack:
+        item = stack.pop(0)
+        if item and isinstance(item[0], (int, float)):
+            found.append(item)
+        else:
+            stack[:0] = item
+    return found
+
+
+def structure(geometry):
+    """The geometry with each position replaced by its dimension count."""
+    if geometry['type'] == 'GeometryCollection':
+        return [geometry['type'], [structure(member) for member in geometry['geometries']]]
+
+    def shape(item):
+        if item and isinstance(item[0], (int, float)):
+            return len(item)
+        return [shape(part) for part in item]
+
+    return [geometry['type'], shape(geometry['coordinates'])]
+
+
+class GeometryCodecTest(unittest.TestCase):
+    def test_float64_round_trip_is_lossless(self):
+        for name, geometry in GEOMETRIES.items():
+            with self.subTest(name):
+                blob = encode_geometry(geometry)
+                self.assertTrue(is_encoded_geometry(blob))
+                self.assertEqual(decode_geometry(blob), geometry)
+
+    def test_quantised_round_trip_stays_within_precision(self):
+        for precision in (0, 5, 7):
+            tolerance = 0.5 / 10 ** precision + 1e-9
+            for name, geometry in GEOMETRIES.items():
+                with self.subTest(name, precision=precision):
+                    decoded = decode_geometry(encode_geometry(geometry, precision))
+                    self.assertEqual(structure(decoded), structure(geometry))
+                    for original, restored in zip(positions(geometry), positions(decoded)):
+                        for a, b in zip(original, restored):
+                            self.assertLessEqual(abs(a - b), tolerance)
+
+    def test_rejects_other_data(self):
+        self.assertFalse(is_encoded_geometry('{"type": "Point"}'))
+        with self.assertRaises(ValueError):
+            decode_geometry(b'{"type": "Point"}')
+
+
+class PackedStoreTest(unittest.TestCase):
+    def test_packed_geometry_survives_repack(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_file = os.path.join(temp_dir, "places.sqlite")
+            multipolygon = GEOMETRIES['MultiPolygon']
+            store = PlaceStore(db_file)
+            try:
+                store.put({'name': "Paris", 'lat': 48.86, 'lon': 2.29, 'boundaries': multipolygon})
+            finally:
+                store.close()
+
+            store = PlaceStore(db_file, geometry_format="packed")
+            try:
+                self.assertEqual(store.repack(), 1)
+                data = store.conn.execute("SELECT data FROM geometries").fetchone()[0]
+                self.assertTrue(is_encoded_geometry(data))
+                self.assertEqual(store.load_boundaries("Paris"), multipolygon)
+                # And back to JSON
+                store.geometry_format = "json"
+                store.repack()
+                self.assertEqual(store.load_boundaries("Paris"), multipolygon)
+            finally:
+                store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Modules under test live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from place_store import PlaceStore
+
+SQUARE = {'type': 'Polygon', 'coordinates': [[[2.0, 48.0], [3.0, 48.0], [3.0, 49.0], [2.0, 49.0], [2.0, 48.0]]]}
+LODS = [[0, SQUARE]]
+
+
+def place(name, lon=2.5, lat=48.5, boundaries=None, **extra):
+    return dict({'name': name, 'lat': lat, 'lon': lon, 'boundaries': boundaries}, **extra)
+
+
+class PlaceStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.db_file = os.path.join(self.temp_dir.name, "places.sqlite")
+        self.store = self.open()
+
+    def open(self, **options):
+        store = PlaceStore(self.db_file, **options)
+        self.addCleanup(store.close)
+        return store
+
+    def rows(self, table):
+        return self.store.conn.execute(f"SELECT name_key FROM {table} ORDER BY name_key").fetchall()
+
+    def test_migrate_from_json_runs_once(self):
+        json_file = os.path.join(self.temp_dir.name, "places_db.json")
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump([place("Paris", boundaries=SQUARE), place("Lyon")], f)
+        self.assertEqual(self.store.migrate_from_json(json_file), 2)
+        self.store.delete("Lyon")
+        self.assertEqual(self.store.migrate_from_json(json_file), 0)
+        self.assertEqual([p['name'] for p in self.store.load_all()], ["Paris"])
+
+    def test_upsert_keeps_row_id_and_order(self):
+        for name in ("Paris", "Lyon", "Nice"):
+            self.store.put(place(name))
+        ids = dict(self.store.conn.execute("SELECT name_key, id FROM places").fetchall())
+        self.store.put(place("Paris", year=2020))
+        self.assertEqual(dict(self.store.conn.execute("SELECT name_key, id FROM places").fetchall()), ids)
+        places = self.store.load_all()
+        self.assertEqual([p['name'] for p in places], ["Paris", "Lyon", "Nice"])
+        self.assertEqual(places[0]['year'], 2020)
+
+    def test_update_during_iteration_yields_each_place_once(self):
+        for name in ("Paris", "Lyon", "Nice"):
+            self.store.put(place(name))
+        names = []
+        for stored in self.store.iter_places(batch_size=1):
+            names.append(stored['name'])
+            if len(names) > 3:
+                # A moved row would come round again forever
+                break
+            self.store.put(place(stored['name'], year=2020))
+        self.assertEqual(names, ["Paris", "Lyon", "Nice"])
+
+    def test_delete_removes_geometry_and_lods(self):
+        self.store.put(place("Paris", boundaries=SQUARE, lods=LODS))
+        self.store.put(place("Lyon", boundaries=SQUARE, lods=LODS))
+        self.assertTrue(self.store.delete("paris"))
+        self.assertFalse(self.store.delete("paris"))
+        self.assertEqual(self.rows("geometries"), [("lyon",)])
+        self.assertEqual(self.rows("geometry_lods"), [("lyon",)])
+
+    def test_replace_all_removes_orphaned_geometry_and_lods(self):
+        self.store.put(place("Paris", boundaries=SQUARE, lods=LODS))
+        self.store.put(place("Lyon", boundaries=SQUARE, lods=LODS))
+        self.store.replace_all([place("Lyon", boundaries=SQUARE, lods=LODS), place("Nice")])
+        self.assertEqual([p['name'] for p in self.store.load_all()], ["Lyon", "Nice"])
+        self.assertEqual(self.rows("geometries"), [("lyon",), ("nice",)])
+        self.assertEqual(self.rows("geometry_lods"), [("lyon",)])
+
+    def test_upgrade_from_v1_moves_geometry_and_adds_bbox(self):
+        self.store.close()
+        os.remove(self.db_file)
+        conn = sqlite3.connect(self.db_file)
+        with conn:
+            conn.execute("CREATE TABLE places (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "name_key TEXT NOT NULL UNIQUE, data TEXT NOT NULL)")
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("INSERT INTO places (name_key, data) VALUES (?, ?)",
+                         ("paris", json.dumps(place("Paris", boundaries=SQUARE))))
+            conn.execute("INSERT INTO places (name_key, data) VALUES (?, ?)", ("lyon", json.dumps(place("Lyon"))))
+        conn.close()
+
+        self.store = self.open()
+        self.assertEqual(self.store.get_meta('schema_version'), str(PlaceStore.SCHEMA_VERSION))
+        metadata = json.loads(self.store.conn.execute("SELECT data FROM places WHERE name_key = 'paris'").fetchone()[0])
+        self.assertNotIn('boundaries', metadata)
+        self.assertEqual(metadata['bbox'], [2.0, 48.0, 3.0, 49.0])
+        paris, lyon = self.store.load_all()
+        self.assertEqual(paris['boundaries'], SQUARE)
+        self.assertIsNone(lyon['boundaries'])
+        self.assertNotIn('bbox', lyon)
+
+    def test_iter_places_pages_past_batch_size(self):
+        names = [f"Place {i}" for i in range(25)]
+        self.store.put_many(place(name, boundaries=SQUARE if i % 2 else None) for i, name in enumerate(names))
+        places = list(self.store.iter_places(batch_size=10))
+        self.assertEqual([p['name'] for p in places], names)
+        self.assertEqual([p['boundaries'] for p in places[:2]], [None, SQUARE])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# Modules under test live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from render_cache import RenderCache
+
+
+class RenderCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.cache = RenderCache(self.temp_dir.name)
+
+    def run_threads(self, target, count=8):
+        errors = []
+
+        def run():
+            try:
+                target()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_misses_render_once(self):
+        renders = []
+
+        def render():
+            renders.append(1)
+            time.sleep(0.1)
+            return "<html></html>"
+
+        self.run_threads(lambda: self.assertEqual(self.cache.get_or_render(('page', 1), render), "<html></html>"))
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(self.cache.render_locks, {})
+
+    def test_concurrent_puts_of_one_key(self):
+        self.run_threads(lambda: self.cache.put(('page', 1), "x" * 100000))
+        self.assertEqual(os.listdir(self.temp_dir.name), [os.path.basename(self.cache.path(('page', 1)))])
+
+    def test_page_survives_restart(self):
+        self.cache.put(('page', 1), "<html></html>")
+        self.assertEqual(RenderCache(self.temp_dir.name).get(('page', 1)), "<html></html>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import sys
+import unittest
+
+# Modules under test live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from TravelMap import TravelMap
+
+try:
+    import folium
+except ImportError:
+    folium = None
+
+
+@unittest.skipIf(folium is None, "folium is not installed")
+class ClusterAssetsTest(unittest.TestCase):
+    def test_markercluster_loads_after_leaflet(self):
+        html = TravelMap(cluster=True).to_html()
+        self.assertIn("leaflet.markercluster.js", html)
+        self.assertLess(html.index("/leaflet.js"), html.index("leaflet.markercluster.js"))
+        self.assertLess(html.index("leaflet.markercluster.js"), html.index("</head>"))
+
+    def test_assets_not_repeated_on_rerender(self):
+        travel_map = TravelMap(cluster=True)
+        travel_map.to_html()
+        self.assertEqual(travel_map.to_html().count("leaflet.markercluster.js"), 1)
+
+    def test_no_cluster_assets_without_markers(self):
+        self.assertNotIn("leaflet.markercluster.js", TravelMap(markers=False, cluster=True).to_html())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,233 @@
+import json
+import math
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from geometry_lod import build_lods, geometry_bbox, level_for_zoom
+from place_store import normalize_name
+from tracing import tracer
+
+# Places are bucketed by the tiles of this zoom level that their bbox covers
+INDEX_ZOOM = 6
+MAX_TILE_ZOOM = 18
+# The apps switch to tiled rendering for catalogues larger than this
+TILE_MODE_THRESHOLD = 500
+
+
+def tile_bounds(z, x, y):
+    """Return (west, south, east, north) in degrees for a slippy map tile."""
+    n = 2 ** z
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, latitude(y + 1), (x + 1) / n * 360 - 180, latitude(y)
+
+
+def tile_range(bbox, z):
+    """Return the (x0, y0, x1, y1) tile range at zoom z covering a bbox."""
+    west, south, east, north = bbox
+    n = 2 ** z
+
+    def column(lon):
+        return min(n - 1, max(0, int((lon + 180) / 360 * n)))
+
+    def row(lat):
+        lat = max(-85.0511, min(85.0511, lat))
+        y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+        return min(n - 1, max(0, int(y)))
+
+    return column(west), row(north), column(east), row(south)
+
+
+def intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class PlaceTileIndex:
+    """Serves the catalogue as bbox-tiled GeoJSON
+
+    A tile z/x/y holds every place whose bounding box intersects it, with the
+    boundary at the level of detail for zoom z (geometry_lod), so a map only
+    downloads what it shows. Features are not clipped; a place crossing tile
+    edges appears in each tile and clients de-duplicate by the `key` property.
+    Encoded tiles are kept in a small LRU cache that is dropped on any change.
+    """
+
+    def __init__(self, places=(), cache_size=256):
+        self.entries = {}
+        self.buckets = {}
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.RLock()
+        self.version = 0
+        for place in places:
+            self.add(place)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, place):
+        """Add or replace a place."""
+        key = normalize_name(place['name'])
+        # Stored places carry their bbox in the metadata, so indexing reads no geometry;
+        # dict.get leaves unloaded boundaries of a LazyPlace alone
+        bbox = place.get('bbox')
+        boundaries = dict.get(place, 'boundaries')
+        if bbox is None and boundaries:
+            bbox = geometry_bbox(boundaries)
+        if bbox is None:
+            bbox = (place['lon'], place['lat'], place['lon'], place['lat'])
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = {'place': place, 'lods': None, 'bbox': tuple(bbox)}
+            x0, y0, x1, y1 = tile_range(bbox, INDEX_ZOOM)
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    self.buckets.setdefault((x, y), set()).add(key)
+            self._changed()
+
+    def remove(self, name):
+        """Remove a place, returning whether it was indexed."""
+        with self.lock:
+            removed = self._remove(normalize_name(name))
+            if removed:
+                self._changed()
+            return removed
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            self.buckets = {}
+            self._changed()
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        x0, y0, x1, y1 = tile_range(entry['bbox'], INDEX_ZOOM)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                bucket = self.buckets.get((x, y))
+                if bucket:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self.buckets[(x, y)]
+        return True
+
+    def _changed(self):
+        self.version += 1
+        self.cache.clear()
+
+    def keys_in(self, bbox):
+        """Return the keys of places whose bbox intersects bbox."""
+        with self.lock:
+            x0, y0, x1, y1 = tile_range(bbox, INDEX_ZOOM)
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.buckets):
+                candidates = set().union(*self.buckets.values()) if self.buckets else set()
+            else:
+                candidates = set()
+                for x in range(x0, x1 + 1):
+                    for y in range(y0, y1 + 1):
+                        candidates.update(self.buckets.get((x, y), ()))
+            return [key for key in candidates if intersects(self.entries[key]['bbox'], bbox)]
+
+    def tile(self, z, x, y):
+        """Return tile z/x/y as a GeoJSON FeatureCollection dict."""
+        features = []
+        with self.lock:
+            entries = [(key, self.entries[key]) for key in self.keys_in(tile_bounds(z, x, y))]
+        for key, entry in sorted(entries):
+            place = entry['place']
+            if entry['lods'] is None:
+                # Read (or, for older places, computed) when a tile first needs the place
+                lods = place.get('lods')
+                entry['lods'] = lods if lods is not None else build_lods(place.get('boundaries'))
+            level, geometry = level_for_zoom(entry['lods'], z)
+            if geometry is None:
+                geometry = place.get('boundaries')
+            features.append({
+                'type': 'Feature',
+                'geometry': geometry,
+                'properties': {'key': key, 'name': place['name'], 'lat': place['lat'], 'lon': place['lon'],
+                               'year': place.get('year'), 'source': place.get('boundary_source'),
+                               'level': level}
+            })
+        return {'type': 'FeatureCollection', 'features': features}
+
+    def tile_bytes(self, z, x, y):
+        """Return tile z/x/y as encoded GeoJSON, from the cache when possible."""
+        with self.lock:
+            cached = self.cache.get((z, x, y))
+            if cached is not None:
+                self.cache.move_to_end((z, x, y))
+                tracer.count('tile_cache.hit')
+                return cached
+            version = self.version
+        tracer.count('tile_cache.miss')
+        with tracer.span('tile', z=z, x=x, y=y) as span:
+            data = json.dumps(self.tile(z, x, y)).encode("utf-8")
+            span['bytes'] = len(data)
+        with self.lock:
+            if version == self.version:
+                self.cache[(z, x, y)] = data
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return data
+
+
+class TileServer:
+    """Local HTTP server for PlaceTileIndex tiles at /tiles/{z}/{x}/{y}.geojson
+
+    Binds to localhost on a free port by default and serves from a daemon
+    thread; `url` is the Leaflet-style URL template for the map page.
+    """
+
+    def __init__(self, index, host="127.0.0.1", port=0):
+        self.index = index
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/tiles/{{z}}/{{x}}/{{y}}.geojson"
+
+    def _handler(self):
+        index = self.index
+
+        class TileHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                try:
+                    if len(parts) != 4 or parts[0] != "tiles" or not parts[3].endswith(".geojson"):
+                        raise ValueError(self.path)
+                    z, x, y = int(parts[1]), int(parts[2]), int(parts[3][:-len(".geojson")])
+                    if not 0 <= z <= MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+                        raise ValueError(self.path)
+                except ValueError:
+                    self.send_error(404)
+                    return
+                data = index.tile_bytes(z, x, y)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/geo+json")
+                self.send_header("Content-Length", str(len(data)))
+                # The map page is loaded from a local file, so every request is cross-origin
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return TileHandler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
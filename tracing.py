@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Tracer:
+    """Records timed spans and counters for diagnosing slow operations
+
+    Spans nest per thread: a span opened while another is open on the same
+    thread records it as its parent, unless a parent span id is passed (for
+    work handed to another thread, see current()). The most recent
+    `max_events` spans and counter changes are kept in memory and can be
+    written as JSON lines or as a Chrome trace (chrome://tracing,
+    ui.perfetto.dev).
+    """
+
+    def __init__(self, max_events=20000):
+        self.events = deque(maxlen=max_events)
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.next_id = 0
+        self.origin = time.perf_counter()
+        self.enabled = True
+
+    def current(self):
+        """Id of the innermost open span on this thread, or None."""
+        stack = self.local.__dict__.get('stack')
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, parent=None, **attrs):
+        """Time the enclosed block as a span; the yielded dict can take more attributes."""
+        if not self.enabled:
+            yield attrs
+            return
+        stack = self.local.__dict__.setdefault('stack', [])
+        with self.lock:
+            self.next_id += 1
+            span_id = self.next_id
+        if parent is None and stack:
+            parent = stack[-1]
+        stack.append(span_id)
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            yield attrs
+        except BaseException as e:
+            status = f"error: {e}"
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            stack.pop()
+            self._add({
+                'type': 'span', 'id': span_id, 'parent': parent, 'name': name,
+                'start': started - self.origin, 'duration': duration,
+                'thread': threading.current_thread().name, 'status': status, 'attrs': attrs
+            })
+
+    def count(self, name, n=1):
+        """Add n to a counter, e.g. tracer.count('geocode_cache.hit')."""
+        if not self.enabled:
+            return
+        with self.lock:
+            value = self.counters.get(name, 0) + n
+            self.counters[name] = value
+        self._add({'type': 'counter', 'name': name, 'value': value,
+                   'start': time.perf_counter() - self.origin, 'thread': threading.current_thread().name})
+
+    def _add(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    def spans(self, name=None):
+        """Recorded spans, oldest first, optionally only those with a name."""
+        with self.lock:
+            events = list(self.events)
+        return [e for e in events if e['type'] == 'span' and (name is None or e['name'] == name)]
+
+    def last(self, name, **attrs):
+        """The most recent span with this name and attribute values, or None."""
+        for span in reversed(self.spans(name)):
+            if all(span['attrs'].get(key) == value for key, value in attrs.items()):
+                return span
+        return None
+
+    def children(self, span):
+        """The spans directly inside a span, in the order they started."""
+        return sorted((e for e in self.spans() if e['parent'] == span['id']), key=lambda e: e['start'])
+
+    def breakdown(self, name, **attrs):
+        """One line with the latest matching span's time and its direct children's, or ""."""
+        span = self.last(name, **attrs)
+        if span is None:
+            return ""
+        parts = [f"{child['name']} {child['duration']:.2f}s" for child in self.children(span)]
+        return f"{span['duration']:.2f}s" + (f" ({', '.join(parts)})" if parts else "")
+
+    def summary(self):
+        """Per span name: {'count', 'total', 'mean', 'max'} in seconds."""
+        stats = {}
+        for span in self.spans():
+            entry = stats.setdefault(span['name'], {'count': 0, 'total': 0.0, 'max': 0.0})
+            entry['count'] += 1
+            entry['total'] += span['duration']
+            entry['max'] = max(entry['max'], span['duration'])
+        for entry in stats.values():
+            entry['mean'] = entry['total'] / entry['count']
+        return stats
+
+    def summary_text(self):
+        """Span statistics and counters as a plain-text table."""
+        lines = [f"{'span':<32}{'count':>7}{'total s':>10}{'mean ms':>10}{'max ms':>10}"]
+        for name, entry in sorted(self.summary().items(), key=lambda item: item[1]['total'], reverse=True):
+            lines.append(f"{name:<32}{entry['count']:>7}{entry['total']:>10.2f}"
+                         f"{entry['mean'] * 1000:>10.1f}{entry['max'] * 1000:>10.1f}")
+        with self.lock:
+            counters = sorted(self.counters.items())
+        if counters:
+            lines.append("")
+            lines.append(f"{'counter':<32}{'value':>7}")
+            lines.extend(f"{name:<32}{value:>7}" for name, value in counters)
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Write the events to path: a Chrome trace for .json, JSON lines otherwise."""
+        if path.lower().endswith(".json"):
+            self.export_chrome_trace(path)
+        else:
+            self.export_jsonl(path)
+
+    def export_jsonl(self, path):
+        with self.lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, default=str) + "\n")
+
+    def export_chrome_trace(self, path):
+        with self.lock:
+            events = list(self.events)
+        threads = {}
+        trace = []
+        for event in events:
+            tid = threads.setdefault(event['thread'], len(threads) + 1)
+            if event['type'] == 'span':
+                trace.append({'name': event['name'], 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                              'ts': event['start'] * 1e6, 'dur': event['duration'] * 1e6,
+                              'args': dict(event['attrs'], status=event['status'])})
+            else:
+                trace.append({'name': event['name'], 'ph': 'C', 'pid': os.getpid(), 'tid': tid,
+                              'ts': event['start'] * 1e6, 'args': {'value': event['value']}})
+        for name, tid in threads.items():
+            trace.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f, default=str)
+
+    def clear(self):
+        with self.lock:
+            self.events.clear()
+            self.counters.clear()
+
+
+# Shared by the data managers, stores, caches and map
+tracer = Tracer()